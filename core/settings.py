@@ -97,6 +97,23 @@ DATABASES = {
     }
 }
 
+# Cache
+# Cached catalog data is invalidated through a shared version key, so every worker must see the same cache.
+# Set REDIS_URL in production; the local-memory fallback is only coherent for a single process.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -142,18 +159,37 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'flights.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Sliding-window limits for the public write and login endpoints, see flights/throttling.py.
+    # `<scope>` applies per client IP, `<scope>_account` per username or email.
+    'DEFAULT_THROTTLE_RATES': {
+        'booking': os.getenv('BOOKING_THROTTLE_RATE', '20/hour'),
+        'booking_account': os.getenv('BOOKING_ACCOUNT_THROTTLE_RATE', '5/hour'),
+        'contact': os.getenv('CONTACT_THROTTLE_RATE', '10/hour'),
+        'contact_account': os.getenv('CONTACT_ACCOUNT_THROTTLE_RATE', '3/hour'),
+        'register': os.getenv('REGISTER_THROTTLE_RATE', '5/hour'),
+        'register_account': os.getenv('REGISTER_ACCOUNT_THROTTLE_RATE', '3/hour'),
+        'login': os.getenv('LOGIN_THROTTLE_RATE', '30/minute'),
+        'login_account': os.getenv('LOGIN_ACCOUNT_THROTTLE_RATE', '10/minute'),
+        # Failed logins per IP and per username before further attempts are refused without hashing the password.
+        'login_failures': os.getenv('LOGIN_FAILURE_THROTTLE_RATE', '10/hour'),
+    },
+    # Only set NUM_PROXIES where the app runs behind that many reverse proxies; the client IP is then taken from
+    # X-Forwarded-For. Unset, DRF's default applies.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES')) if os.getenv('NUM_PROXIES') else None,
 }
 
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
 }
+# Seconds a user resolved from an access token is reused before it is loaded again, see flights/authentication.py.
+JWT_USER_CACHE_TIMEOUT = int(os.getenv('JWT_USER_CACHE_TIMEOUT', '60'))
 
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Flight Package API',
@@ -163,6 +199,22 @@ SPECTACULAR_SETTINGS = {
     # OTHER SETTINGS
 }
 
+# How long a create request's Idempotency-Key is remembered and its response replayed, see flights/idempotency.py.
+IDEMPOTENCY_KEY_TIMEOUT = int(os.getenv('IDEMPOTENCY_KEY_TIMEOUT', str(60 * 60 * 24)))
+
+# Retention for archived (is_hidden) records, applied by `python manage.py purge_archived`.
+# 'purge' deletes the rows, 'move' copies them into flights.ArchivedRecord before deleting.
+FLIGHTS_RETENTION_POLICIES = {
+    'flights.BookingApplication': {
+        'days': int(os.getenv('BOOKING_RETENTION_DAYS', '180')),
+        'action': os.getenv('BOOKING_RETENTION_ACTION', 'move'),
+    },
+    'flights.ContactMessage': {
+        'days': int(os.getenv('CONTACT_MESSAGE_RETENTION_DAYS', '90')),
+        'action': os.getenv('CONTACT_MESSAGE_RETENTION_ACTION', 'purge'),
+    },
+}
+
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Build the in-memory autocomplete index once here; with `gunicorn --preload` (see Procfile) this runs in the
+# master process and the forked workers share it. Close the connection used so workers don't inherit it.
+from django.db import connections  # noqa: E402
+from flights.suggest import warm_suggest_index  # noqa: E402
+
+warm_suggest_index()
+connections.close_all()
@@ -0,0 +1,135 @@
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+
+from .models import BookingApplication, BookingRollup, FlightPackage
+
+GRANULARITIES = ('day', 'week')
+RECENT_DAYS = 7
+GROUP_BY_FIELDS = {
+    'package': 'package',
+    'destination': 'destination',
+    'airline': 'airline',
+}
+
+
+def period_start(day, granularity):
+    if granularity == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    return day
+
+
+def _bump_rollup(granularity, period, package, bookings, passengers):
+    rollups = BookingRollup.objects.filter(granularity=granularity, period_start=period, package_id=package.pk)
+    increments = {'bookings': F('bookings') + bookings, 'passengers': F('passengers') + passengers}
+    if rollups.update(**increments) or bookings < 0:
+        # Nothing to take a booking back from: it predates the rollups or was never counted.
+        return
+    try:
+        with transaction.atomic():
+            BookingRollup.objects.create(granularity=granularity, period_start=period, package_id=package.pk,
+                                         destination=package.destination, airline=package.airline,
+                                         bookings=bookings, passengers=passengers)
+    except IntegrityError:
+        # Another request created the row first.
+        rollups.update(**increments)
+
+
+def record_booking(booking, sign=1):
+    """Add (sign=1) or remove (sign=-1) a booking from the day and week rollups."""
+    day = timezone.localdate(booking.date_booked)
+    for granularity in GRANULARITIES:
+        _bump_rollup(granularity, period_start(day, granularity), booking.package,
+                     sign, sign * booking.number_of_passengers)
+
+
+def is_recent(booking):
+    return booking.date_booked >= timezone.now() - datetime.timedelta(days=RECENT_DAYS)
+
+
+def update_package_counters(booking, sign=1):
+    """Atomically add (sign=1) or remove (sign=-1) a booking from its package's demand counters."""
+    passengers = sign * booking.number_of_passengers
+    counters = {'total_bookings': F('total_bookings') + sign, 'total_passengers': F('total_passengers') + passengers}
+    if is_recent(booking):
+        counters.update(recent_bookings=F('recent_bookings') + sign,
+                        recent_passengers=F('recent_passengers') + passengers)
+    FlightPackage.objects.filter(pk=booking.package_id).update(**counters)
+
+
+def _active_bookings_subquery(aggregate, since=None):
+    bookings = BookingApplication.objects.filter(package=OuterRef('pk'), is_hidden=False)
+    if since is not None:
+        bookings = bookings.filter(date_booked__gte=since)
+    return Coalesce(Subquery(bookings.order_by().values('package').annotate(value=aggregate).values('value')), 0)
+
+
+def reconcile_package_counters(batch_size=500):
+    """Recompute every package's counters from the active bookings, which also ages out the recent window.
+
+    Each batch is a single UPDATE, so increments from concurrent bookings are not lost. Returns the number of
+    packages processed.
+    """
+    since = timezone.now() - datetime.timedelta(days=RECENT_DAYS)
+    pks = list(FlightPackage.objects.order_by('pk').values_list('pk', flat=True))
+    for offset in range(0, len(pks), batch_size):
+        FlightPackage.objects.filter(pk__in=pks[offset:offset + batch_size]).update(
+            total_bookings=_active_bookings_subquery(Count('id')),
+            total_passengers=_active_bookings_subquery(Sum('number_of_passengers')),
+            recent_bookings=_active_bookings_subquery(Count('id'), since=since),
+            recent_passengers=_active_bookings_subquery(Sum('number_of_passengers'), since=since),
+        )
+    return len(pks)
+
+
+def rebuild_rollups(since=None):
+    """Recompute the rollups of active bookings from scratch, optionally only for periods starting at `since`.
+
+    Returns the number of rollup rows written.
+    """
+    written = 0
+    with transaction.atomic():
+        for granularity in GRANULARITIES:
+            stale = BookingRollup.objects.filter(granularity=granularity)
+            bookings = BookingApplication.objects.filter(is_hidden=False)
+            if since is not None:
+                since_period = period_start(since, granularity)
+                stale = stale.filter(period_start__gte=since_period)
+                bookings = bookings.filter(date_booked__gte=timezone.make_aware(
+                    datetime.datetime.combine(since_period, datetime.time.min)))
+            stale.delete()
+
+            rows = (bookings
+                    .annotate(period=Trunc('date_booked', granularity, output_field=DateField(),
+                                           tzinfo=timezone.get_current_timezone()))
+                    .values('period', 'package_id', 'package__destination', 'package__airline')
+                    .annotate(bookings=Count('id'), passengers=Sum('number_of_passengers'))
+                    .order_by())
+            rollups = [
+                BookingRollup(granularity=granularity, period_start=row['period'], package_id=row['package_id'],
+                              destination=row['package__destination'], airline=row['package__airline'],
+                              bookings=row['bookings'], passengers=row['passengers'] or 0)
+                for row in rows.iterator()
+            ]
+            BookingRollup.objects.bulk_create(rollups, batch_size=1000)
+            written += len(rollups)
+    return written
+
+
+def booking_series(start, end, granularity='day', group_by=None):
+    """Read bookings and passenger totals per period from the rollups only."""
+    rollups = BookingRollup.objects.filter(granularity=granularity, period_start__gte=period_start(start, granularity),
+                                           period_start__lte=end)
+    columns = ['period_start']
+    if group_by:
+        columns.append(GROUP_BY_FIELDS[group_by])
+    rows = list(rollups.values(*columns)
+                .annotate(bookings=Sum('bookings'), passengers=Sum('passengers'))
+                .filter(bookings__gt=0)
+                .order_by(*columns))
+    for row in rows:
+        row['period'] = row.pop('period_start')
+    return rows
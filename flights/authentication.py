@@ -0,0 +1,62 @@
+"""
+JWT authentication that caches the resolved user.
+
+simplejwt's `JWTAuthentication` loads the user row on every request. Here the fields permission checks need (pk,
+`is_active`, `is_staff`, `is_superuser`, plus a hash of the password hash when `CHECK_REVOKE_TOKEN` is on) are kept
+in the default cache for `JWT_USER_CACHE_TIMEOUT` seconds, so admin dashboards polling list and count endpoints skip
+that query. The user is rebuilt from them with every other field deferred, so e.g. `check_password` still loads the
+password on demand; the password hash itself never goes into the cache. Entries are dropped once a user save or
+delete commits (password change, deactivation), see `flights.signals`.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+CACHED_USER_FIELDS = ('is_active', 'is_staff', 'is_superuser')
+
+
+def user_cache_key(user_id):
+    return f'jwt_user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        key = user_cache_key(user_id)
+        entry = cache.get(key) if user_id is not None else None
+        if entry is None:
+            # Resolve and validate (existence, is_active, revoked password) exactly as simplejwt does.
+            user = super().get_user(validated_token)
+            cache.set(key, self.cache_entry(user), settings.JWT_USER_CACHE_TIMEOUT)
+            return user
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != entry['revoke']:
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return self.user_from_entry(entry)
+
+    def cache_entry(self, user):
+        entry = {'pk': user.pk, **{field: getattr(user, field) for field in CACHED_USER_FIELDS}}
+        if api_settings.CHECK_REVOKE_TOKEN:
+            entry['revoke'] = get_md5_hash_password(user.password)
+        return entry
+
+    def user_from_entry(self, entry):
+        fields = [field for field in self.user_model._meta.concrete_fields
+                  if field.primary_key or field.attname in CACHED_USER_FIELDS]
+        return self.user_model.from_db(router.db_for_read(self.user_model), [field.attname for field in fields],
+                                       [entry['pk'] if field.primary_key else entry[field.attname] for field in fields])
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """Documents `CachedJWTAuthentication` in the OpenAPI schema as simplejwt's bearer scheme."""
+    target_class = 'flights.authentication.CachedJWTAuthentication'
@@ -0,0 +1,24 @@
+import uuid
+
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = 'flights:catalog_version'
+
+
+def catalog_version():
+    """Token that changes whenever a flight package is created, changed, archived, restored or deleted."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(CATALOG_VERSION_KEY, version, None):
+            version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def catalog_cache_key(prefix, *parts):
+    """Cache key that expires implicitly on the next catalog change."""
+    return ':'.join([prefix, catalog_version(), *map(str, parts)])
@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models import Q
+
+from .models import FareCalendarDay, FlightPackage
+
+
+def fare_keys(package):
+    """The calendar is keyed on the resolved airports, so every spelling of a place shares one calendar."""
+    return package.origin_airport_id, package.destination_airport_id, package.departure_date
+
+
+def refresh_fare_day(origin_airport_id, destination_airport_id, day):
+    """Recompute the calendar entry of one route and departure day from the active packages."""
+    if origin_airport_id is None or destination_airport_id is None:
+        return
+    route = {'origin_airport_id': origin_airport_id, 'destination_airport_id': destination_airport_id}
+    packages = FlightPackage.objects.filter(is_hidden=False, departure_date=day, **route)
+    prices = list(packages.order_by('price', 'id').values_list('id', 'price'))
+    entry = FareCalendarDay.objects.filter(day=day, **route)
+    if not prices:
+        entry.delete()
+        return
+    package_id, min_price = prices[0]
+    FareCalendarDay.objects.update_or_create(
+        day=day, **route, defaults={'min_price': min_price, 'package_id': package_id, 'package_count': len(prices)})
+
+
+def rebuild_fare_calendar(package_model=FlightPackage, day_model=FareCalendarDay, airport_id=None):
+    """Recompute the calendar in one ordered scan of the active packages. Returns the number of days written.
+
+    With `airport_id`, only the routes from or to that airport are rebuilt, e.g. after airports were merged into it.
+    The models can be swapped for their historical versions when called from a migration.
+    """
+    packages = package_model.objects.filter(is_hidden=False, origin_airport__isnull=False,
+                                            destination_airport__isnull=False)
+    stale = day_model.objects.all()
+    if airport_id is not None:
+        route = Q(origin_airport_id=airport_id) | Q(destination_airport_id=airport_id)
+        packages, stale = packages.filter(route), stale.filter(route)
+    days = []
+    current = None
+    rows = (packages.order_by('origin_airport_id', 'destination_airport_id', 'departure_date', 'price', 'id')
+            .values_list('origin_airport_id', 'destination_airport_id', 'departure_date', 'price', 'id'))
+    for origin_airport_id, destination_airport_id, day, price, package_id in rows.iterator():
+        if current is not None and (current.origin_airport_id, current.destination_airport_id, current.day) == \
+                (origin_airport_id, destination_airport_id, day):
+            current.package_count += 1
+            continue
+        current = day_model(origin_airport_id=origin_airport_id, destination_airport_id=destination_airport_id,
+                            day=day, min_price=price, package_id=package_id, package_count=1)
+        days.append(current)
+    with transaction.atomic():
+        stale.delete()
+        day_model.objects.bulk_create(days, batch_size=1000)
+    return len(days)
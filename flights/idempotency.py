@@ -0,0 +1,59 @@
+"""
+Idempotency-Key support for the public create endpoints.
+
+A create request sent with an `Idempotency-Key` header is recorded together with a fingerprint of its body and its
+response. Retries with the same key get that response back, from the cache without touching the database or, when
+the cache lost it, from `IdempotencyRecord`. The record's unique key also stops two concurrent first attempts from
+both creating.
+"""
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def record_key(scope, key):
+    return f'{scope}:{key}'
+
+
+def _cache_key(key):
+    return f"idempotency:{hashlib.md5(key.encode()).hexdigest()}"
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def expiry_cutoff():
+    return timezone.now() - datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TIMEOUT)
+
+
+def stored_outcome(key):
+    """(fingerprint, status_code, data) of the request already completed with `key`, or None."""
+    outcome = cache.get(_cache_key(key))
+    if outcome is None:
+        outcome = (IdempotencyRecord.objects.filter(key=key, date_created__gte=expiry_cutoff())
+                   .values_list('fingerprint', 'status_code', 'response').first())
+        if outcome is not None:
+            store_outcome(key, *outcome)
+    return outcome
+
+
+def store_outcome(key, fingerprint, status_code, data):
+    cache.set(_cache_key(key), (fingerprint, status_code, data), settings.IDEMPOTENCY_KEY_TIMEOUT)
+
+
+def purge_expired_records():
+    """Delete records past IDEMPOTENCY_KEY_TIMEOUT. Returns the number of rows deleted."""
+    deleted, _ = IdempotencyRecord.objects.filter(date_created__lt=expiry_cutoff()).delete()
+    return deleted
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from flights.models import ContactMessage
+
+
+class Command(BaseCommand):
+    help = 'Compute the plain-text preview and size metadata of contact messages written before they existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Messages updated per batch.')
+        parser.add_argument('--all', action='store_true', help='Recompute every message, not only missing ones.')
+
+    def handle(self, *args, **options):
+        messages = ContactMessage.objects.order_by('pk').only('pk', 'message')
+        if not options['all']:
+            # Every stored message has a non-zero size once its preview has been computed.
+            messages = messages.filter(message_size=0)
+        fields = list(ContactMessage.preview_fields(''))
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(messages.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            for message in batch:
+                message.refresh_preview()
+            ContactMessage.objects.bulk_update(batch, fields)
+            updated += len(batch)
+            last_pk = batch[-1].pk
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} contact messages'))
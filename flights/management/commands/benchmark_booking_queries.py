@@ -0,0 +1,63 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from flights.models import BookingApplication, FlightPackage
+from flights.partitions import TABLE
+
+BENCHMARK_NATIONALITY = '__benchmark__'
+
+
+class Command(BaseCommand):
+    help = ('Time the admin "recent bookings" range query. Optionally seed synthetic bookings first, '
+            'e.g. --seed 20000000 --months 36, and remove them afterwards with --cleanup.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Number of synthetic bookings to insert first.')
+        parser.add_argument('--months', type=int, default=24, help='History spread of the seeded bookings.')
+        parser.add_argument('--days', type=int, default=7, help='Width of the recent range that is queried.')
+        parser.add_argument('--runs', type=int, default=5, help='Number of timed runs.')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded bookings and exit.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The benchmark targets PostgreSQL.')
+        quote = connection.ops.quote_name
+
+        if options['cleanup']:
+            deleted, _ = BookingApplication.objects.filter(nationality=BENCHMARK_NATIONALITY).delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} benchmark rows'))
+            return
+
+        if options['seed']:
+            package = FlightPackage.objects.order_by('pk').first()
+            if package is None:
+                raise CommandError('Create at least one FlightPackage before seeding bookings.')
+            started = time.monotonic()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {quote(TABLE)} (package_id, first_name, last_name, email, number_of_passengers, '
+                    f'phone_number, date_of_birth, gender, nationality, date_booked, is_hidden) '
+                    f"SELECT %s, 'Bench', 'Mark', 'bench@example.com', 1 + (n %% 4), '0000000000', '1990-01-01', "
+                    f"'m', %s, now() - (random() * %s * interval '1 day'), (n %% 20 = 0) "
+                    f'FROM generate_series(1, %s) AS n',
+                    [package.pk, BENCHMARK_NATIONALITY, options['months'] * 30, options['seed']])
+                cursor.execute(f'ANALYZE {quote(TABLE)}')
+            self.stdout.write(f"Seeded {options['seed']} rows in {time.monotonic() - started:.1f}s")
+
+        since = timezone.now() - datetime.timedelta(days=options['days'])
+        queryset = BookingApplication.objects.filter(is_hidden=False, date_booked__gte=since).order_by('-date_booked')
+        self.stdout.write(queryset[:50].explain(analyze=True))
+        timings = []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            list(queryset[:50])
+            queryset.count()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(self.style.SUCCESS(
+            f"{BookingApplication.objects.count()} rows total; recent {options['days']}-day page + count: "
+            f"min {timings[0]:.2f} ms, median {timings[len(timings) // 2]:.2f} ms, max {timings[-1]:.2f} ms"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from flights.recommendations import TOP_N, rebuild_similar_packages, refresh_stale_similar_packages
+
+
+class Command(BaseCommand):
+    help = 'Recompute the top-N similar active packages of every active flight package.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=TOP_N, help='Number of recommendations kept per package.')
+        parser.add_argument('--stale', action='store_true',
+                            help='Only recompute the packages flagged stale by edits since the last run.')
+
+    def handle(self, *args, **options):
+        if options['stale']:
+            refreshed = refresh_stale_similar_packages(limit=options['top_n'])
+            self.stdout.write(self.style.SUCCESS(f'Refreshed {refreshed} stale packages'))
+            return
+        written = rebuild_similar_packages(limit=options['top_n'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} similar package rows'))
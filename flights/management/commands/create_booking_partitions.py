@@ -0,0 +1,29 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from flights.partitions import add_months, ensure_month_partitions, is_partitioned, month_start, parse_month
+
+
+class Command(BaseCommand):
+    help = 'Create monthly BookingApplication partitions ahead of time. Run it from a scheduler, e.g. daily.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Number of future months to create partitions for.')
+        parser.add_argument('--from', dest='from_month', help='First month to create (YYYY-MM). Defaults to now.')
+
+    def handle(self, *args, **options):
+        if not is_partitioned(connection):
+            raise CommandError('The bookings table is not partitioned (PostgreSQL only, see migration 0008).')
+        try:
+            first_month = parse_month(options['from_month']) if options['from_month'] else \
+                month_start(datetime.datetime.now(datetime.timezone.utc).date())
+        except ValueError:
+            raise CommandError('--from must be in YYYY-MM format')
+        this_month = month_start(datetime.datetime.now(datetime.timezone.utc).date())
+        created = ensure_month_partitions(connection, first_month, add_months(this_month, options['months_ahead']))
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} partition(s) created'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from flights.partitions import detach_month_partition, is_partitioned, list_partitions, parse_month, partition_month
+
+
+class Command(BaseCommand):
+    help = 'Detach (and optionally drop) monthly BookingApplication partitions older than a given month.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True,
+                            help='Detach every monthly partition strictly before this month (YYYY-MM).')
+        parser.add_argument('--concurrently', action='store_true',
+                            help='Use DETACH PARTITION CONCURRENTLY (PostgreSQL 14+) to avoid blocking queries.')
+        parser.add_argument('--drop', action='store_true', help='Drop the detached tables instead of keeping them.')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the partitions that would be detached.')
+
+    def handle(self, *args, **options):
+        if not is_partitioned(connection):
+            raise CommandError('The bookings table is not partitioned (PostgreSQL only, see migration 0008).')
+        try:
+            before = parse_month(options['before'])
+        except ValueError:
+            raise CommandError('--before must be in YYYY-MM format')
+
+        months = sorted(month for month in (partition_month(name) for name, _ in list_partitions(connection))
+                        if month and month < before)
+        for month in months:
+            if options['dry_run']:
+                self.stdout.write(f'[dry-run] would detach {month:%Y-%m}')
+                continue
+            detach_month_partition(connection, month, concurrently=options['concurrently'], drop=options['drop'])
+            self.stdout.write(f"{'Dropped' if options['drop'] else 'Detached'} partition for {month:%Y-%m}")
+        self.stdout.write(self.style.SUCCESS(f'{len(months)} partition(s) processed'))
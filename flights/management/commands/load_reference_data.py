@@ -0,0 +1,45 @@
+import csv
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flights.reference import load_airline, load_airport
+
+DATA_DIR = Path(__file__).resolve().parents[2] / 'data'
+
+
+def split_aliases(value):
+    return [alias for alias in (value or '').split('|') if alias.strip()]
+
+
+class Command(BaseCommand):
+    help = ('Load airports and airlines with their IATA codes and common spellings, and fold the matching '
+            'auto-created entries into them. Defaults to the data bundled in flights/data; files use the same '
+            'columns (airports: iata_code,name,city,country,aliases; airlines: iata_code,name,aliases; '
+            'aliases separated by |).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--airports', default=DATA_DIR / 'airports.csv', help='Airports CSV file.')
+        parser.add_argument('--airlines', default=DATA_DIR / 'airlines.csv', help='Airlines CSV file.')
+
+    def read(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8') as handle:
+                return list(csv.DictReader(handle))
+        except OSError as e:
+            raise CommandError(str(e))
+
+    def handle(self, *args, **options):
+        for label, path, load in (
+                ('airports', options['airports'], lambda row: load_airport(
+                    row['iata_code'], row['name'], row['city'], row.get('country', ''), split_aliases(row['aliases']))),
+                ('airlines', options['airlines'], lambda row: load_airline(
+                    row['iata_code'], row['name'], split_aliases(row['aliases'])))):
+            created = merged = skipped = 0
+            for row in self.read(path):
+                row_created, row_merged, row_skipped = load(row)
+                created += row_created
+                merged += row_merged
+                skipped += row_skipped
+            self.stdout.write(self.style.SUCCESS(
+                f'{label}: created={created} merged={merged} aliases_skipped={skipped}'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from flights.models import Airline, AirlineAlias, Airport, AirportAlias
+from flights.reference import merge_airlines, merge_airports, normalize_alias
+
+KINDS = {
+    'airport': (Airport, AirportAlias, 'airport', merge_airports),
+    'airline': (Airline, AirlineAlias, 'airline', merge_airlines),
+}
+
+
+class Command(BaseCommand):
+    help = ('Merge the airports or airlines that the given spellings resolve to into one target, e.g. '
+            'merge_reference_aliases airport LOS ikeja "lagos island". Their aliases and packages move to the target.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(KINDS))
+        parser.add_argument('target', help='IATA code or known spelling of the entry to keep.')
+        parser.add_argument('spellings', nargs='+', help='Spellings whose entries are merged into the target.')
+
+    def handle(self, *args, **options):
+        reference_model, alias_model, reference_field, merge = KINDS[options['kind']]
+
+        def lookup(value):
+            reference_id = (alias_model.objects.filter(alias=normalize_alias(value))
+                            .values_list(f'{reference_field}_id', flat=True).first())
+            if reference_id is None:
+                reference_id = (reference_model.objects.filter(iata_code=value.strip().upper())
+                                .values_list('id', flat=True).first())
+            if reference_id is None:
+                raise CommandError(f"No {options['kind']} is known as '{value}'")
+            return reference_id
+
+        target_id = lookup(options['target'])
+        merged = merge([lookup(value) for value in options['spellings']], target_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Merged {merged} {options['kind']}(s) into {reference_model.objects.get(pk=target_id)}"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from flights.retention import apply_retention_policy, get_retention_policies
+
+
+class Command(BaseCommand):
+    help = 'Purge or move archived records past their retention period (see FLIGHTS_RETENTION_POLICIES).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='models',
+                            help='Only apply the policy for this model label, e.g. flights.BookingApplication.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows deleted per committed batch.')
+        parser.add_argument('--sleep', type=float, default=0.5, help='Seconds to pause between batches.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be affected.')
+
+    def handle(self, *args, **options):
+        policies = get_retention_policies()
+        labels = options['models'] or list(policies)
+        unknown = [label for label in labels if label not in policies]
+        if unknown:
+            raise CommandError(f"No retention policy configured for: {', '.join(unknown)}")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be a positive integer')
+
+        for label in labels:
+            try:
+                stats = apply_retention_policy(label, policies[label], batch_size=options['batch_size'],
+                                               sleep=options['sleep'], dry_run=options['dry_run'])
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e))
+            if options['dry_run']:
+                self.stdout.write(f"[dry-run] {label}: {stats['matched']} archived rows older than "
+                                  f"{stats['days']} days would be {stats['action']}d")
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{label}: moved={stats['moved']} purged={stats['purged']} batches={stats['batches']} "
+                    f"seconds={stats.get('seconds', 0)}"))
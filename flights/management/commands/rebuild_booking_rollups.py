@@ -0,0 +1,22 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flights.analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily and weekly booking rollups from the raw BookingApplication rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild periods from this day on (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be in YYYY-MM-DD format')
+        written = rebuild_rollups(since=since)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} rollup rows'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from flights.fares import rebuild_fare_calendar
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the fare calendar (lowest price per route and departure day) from the active flight packages.'
+
+    def handle(self, *args, **options):
+        written = rebuild_fare_calendar()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} fare calendar days'))
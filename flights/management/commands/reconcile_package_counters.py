@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from flights.analytics import reconcile_package_counters
+
+
+class Command(BaseCommand):
+    help = ('Recompute the denormalized booking counters on FlightPackage from the active bookings. '
+            'Run it periodically (e.g. hourly) so the 7-day recent counters age out.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Packages updated per statement.')
+
+    def handle(self, *args, **options):
+        processed = reconcile_package_counters(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters for {processed} packages'))
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.4 on 2026-10-19 15:57
+
+import django.core.serializers.json
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_date_hidden(apps, schema_editor):
+    # Rows archived before date_hidden existed start their retention period now.
+    now = timezone.now()
+    for model_name in ('FlightPackage', 'BookingApplication', 'ContactMessage'):
+        model = apps.get_model('flights', model_name)
+        model.objects.filter(is_hidden=True, date_hidden__isnull=True).update(date_hidden=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0006_rename_full_name_bookingapplication_first_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingapplication',
+            name='date_hidden',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='date_hidden',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flightpackage',
+            name='date_hidden',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ArchivedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('date_hidden', models.DateTimeField(blank=True, null=True)),
+                ('date_moved', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model_label', 'object_id'], name='flights_arc_model_l_f751f1_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_date_hidden, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from flights.partitions import convert_to_partitioned, is_partitioned
+
+
+def partition_bookings(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or is_partitioned(connection):
+        return
+    convert_to_partitioned(connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0007_archived_record_date_hidden'),
+    ]
+
+    operations = [
+        # Postgres only; the ORM schema is unchanged, so other backends keep the plain table.
+        migrations.RunPython(partition_bookings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.4 on 2026-10-19 15:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    BookingApplication = apps.get_model('flights', 'BookingApplication')
+    BookingRollup = apps.get_model('flights', 'BookingRollup')
+    for granularity in ('day', 'week'):
+        rows = (BookingApplication.objects.filter(is_hidden=False)
+                .annotate(period=Trunc('date_booked', granularity, output_field=DateField(),
+                                       tzinfo=timezone.get_current_timezone()))
+                .values('period', 'package_id', 'package__destination', 'package__airline')
+                .annotate(bookings=Count('id'), passengers=Sum('number_of_passengers'))
+                .order_by())
+        BookingRollup.objects.bulk_create([
+            BookingRollup(granularity=granularity, period_start=row['period'], package_id=row['package_id'],
+                          destination=row['package__destination'], airline=row['package__airline'],
+                          bookings=row['bookings'], passengers=row['passengers'] or 0)
+            for row in rows.iterator()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0008_partition_bookingapplication'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('destination', models.CharField(max_length=255)),
+                ('airline', models.CharField(max_length=255)),
+                ('bookings', models.IntegerField(default=0)),
+                ('passengers', models.IntegerField(default=0)),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_rollups', to='flights.flightpackage')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'period_start'], name='flights_boo_granula_deb7f7_idx')],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'period_start', 'package'), name='unique_booking_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
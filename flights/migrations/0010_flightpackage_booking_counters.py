@@ -0,0 +1,62 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:00
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def backfill_counters(apps, schema_editor):
+    FlightPackage = apps.get_model('flights', 'FlightPackage')
+    BookingApplication = apps.get_model('flights', 'BookingApplication')
+
+    def active_bookings(aggregate, since=None):
+        bookings = BookingApplication.objects.filter(package=OuterRef('pk'), is_hidden=False)
+        if since is not None:
+            bookings = bookings.filter(date_booked__gte=since)
+        return Coalesce(Subquery(bookings.order_by().values('package').annotate(value=aggregate).values('value')), 0)
+
+    since = timezone.now() - datetime.timedelta(days=7)
+    FlightPackage.objects.update(
+        total_bookings=active_bookings(Count('id')),
+        total_passengers=active_bookings(Sum('number_of_passengers')),
+        recent_bookings=active_bookings(Count('id'), since=since),
+        recent_passengers=active_bookings(Sum('number_of_passengers'), since=since),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0009_bookingrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightpackage',
+            name='recent_bookings',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='flightpackage',
+            name='recent_passengers',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='flightpackage',
+            name='total_bookings',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='flightpackage',
+            name='total_passengers',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='flightpackage',
+            index=models.Index(fields=['is_hidden', '-recent_bookings', '-total_bookings'], name='flightpackage_popular_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0010_flightpackage_booking_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactmessage',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='message_length',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='message_preview',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='message_size',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0011_contactmessage_preview'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flightpackage',
+            index=models.Index(fields=['is_hidden', 'departure_date', 'price'], name='flightpackage_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightpackage',
+            index=models.Index(fields=['is_hidden', 'price'], name='flightpackage_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightpackage',
+            index=models.Index(fields=['is_hidden', 'return_date'], name='flightpackage_return_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightpackage',
+            index=models.Index(fields=['is_hidden', '-date_created'], name='flightpackage_newest_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0012_flightpackage_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FareCalendarDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin_key', models.CharField(max_length=255)),
+                ('destination_key', models.CharField(max_length=255)),
+                ('day', models.DateField()),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('package_count', models.PositiveIntegerField(default=1)),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fare_calendar_days', to='flights.flightpackage')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('origin_key', 'destination_key', 'day'), name='unique_fare_calendar_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:08
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 500
+
+
+def normalize_alias(value):
+    return ' '.join((value or '').split()).lower()
+
+
+def map_reference_keys(apps, schema_editor):
+    FlightPackage = apps.get_model('flights', 'FlightPackage')
+    Airport = apps.get_model('flights', 'Airport')
+    AirportAlias = apps.get_model('flights', 'AirportAlias')
+    Airline = apps.get_model('flights', 'Airline')
+    AirlineAlias = apps.get_model('flights', 'AirlineAlias')
+
+    airports, airlines = {}, {}
+    last_pk = 0
+    while True:
+        packages = list(FlightPackage.objects.filter(pk__gt=last_pk).order_by('pk')
+                        .only('pk', 'origin', 'destination', 'airline')[:BATCH_SIZE])
+        if not packages:
+            break
+        # One transaction per batch; the migration itself is not atomic, see Migration.atomic.
+        with transaction.atomic():
+            for package in packages:
+                for value in (package.origin, package.destination):
+                    alias = normalize_alias(value)
+                    if alias and alias not in airports:
+                        airport = Airport.objects.create(city=' '.join(value.split()))
+                        AirportAlias.objects.create(alias=alias, airport=airport)
+                        airports[alias] = airport.pk
+                alias = normalize_alias(package.airline)
+                if alias and alias not in airlines:
+                    airline = Airline.objects.create(name=' '.join(package.airline.split()))
+                    AirlineAlias.objects.create(alias=alias, airline=airline)
+                    airlines[alias] = airline.pk
+                package.origin_airport_id = airports.get(normalize_alias(package.origin))
+                package.destination_airport_id = airports.get(normalize_alias(package.destination))
+                package.airline_ref_id = airlines.get(normalize_alias(package.airline))
+            FlightPackage.objects.bulk_update(packages, ['origin_airport', 'destination_airport', 'airline_ref'])
+        last_pk = packages[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Lets map_reference_keys commit batch by batch instead of holding one transaction over the whole table.
+    atomic = False
+
+    dependencies = [
+        ('flights', '0013_farecalendarday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Airline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iata_code', models.CharField(blank=True, max_length=2, null=True, unique=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Airport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iata_code', models.CharField(blank=True, max_length=3, null=True, unique=True)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('city', models.CharField(max_length=255)),
+                ('country', models.CharField(blank=True, default='', max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AirportAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='flightpackage',
+            name='airline_ref',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='packages', to='flights.airline'),
+        ),
+        migrations.CreateModel(
+            name='AirlineAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=255, unique=True)),
+                ('airline', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='flights.airline')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='flightpackage',
+            name='destination_airport',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='arriving_packages', to='flights.airport'),
+        ),
+        migrations.AddField(
+            model_name='flightpackage',
+            name='origin_airport',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='departing_packages', to='flights.airport'),
+        ),
+        migrations.AddIndex(
+            model_name='flightpackage',
+            index=models.Index(fields=['is_hidden', 'origin_airport', 'destination_airport'], name='flightpackage_route_idx'),
+        ),
+        migrations.AddField(
+            model_name='airportalias',
+            name='airport',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='flights.airport'),
+        ),
+        migrations.AddIndex(
+            model_name='airlinealias',
+            index=models.Index(fields=['alias'], name='airlinealias_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='airportalias',
+            index=models.Index(fields=['alias'], name='airportalias_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(map_reference_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0014_airport_airline_reference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarPackage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_packages', to='flights.flightpackage')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_for', to='flights.flightpackage')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('package', 'rank'), name='unique_similar_package_rank')],
+            },
+        ),
+    ]
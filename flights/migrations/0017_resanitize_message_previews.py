@@ -0,0 +1,41 @@
+import html
+import re
+
+from django.db import migrations
+from django.db.models import Q
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+PREVIEW_LENGTH = 200
+
+
+def preview_fields(message):
+    # ContactMessage.preview_fields as of this migration, copied so later changes to the model cannot alter it.
+    message = message or ''
+    text = re.sub(r'<(script|style)\b.*?</\1\s*>', ' ', message, flags=re.IGNORECASE | re.DOTALL)
+    text = ' '.join(strip_tags(html.unescape(strip_tags(text))).split())
+    return {
+        'message_preview': Truncator(text).chars(PREVIEW_LENGTH),
+        'message_length': len(text),
+        'message_size': len(message.encode('utf-8')),
+        'image_count': len(re.findall(r'<img\b', message, flags=re.IGNORECASE)),
+    }
+
+
+def resanitize_previews(apps, schema_editor):
+    ContactMessage = apps.get_model('flights', 'ContactMessage')
+    # Only previews that can hold markup decoded from escaped entities need recomputing.
+    messages = ContactMessage.objects.filter(Q(message_preview__contains='<') | Q(message_preview__contains='>'))
+    for message in messages.only('pk', 'message').iterator():
+        ContactMessage.objects.filter(pk=message.pk).update(**preview_fields(message.message))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0016_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.RunPython(resanitize_previews, migrations.RunPython.noop),
+    ]
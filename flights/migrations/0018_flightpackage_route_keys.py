@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0017_resanitize_message_previews'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightpackage',
+            name='destination_key',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='flightpackage',
+            name='origin_key',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='flightpackage',
+            index=models.Index(fields=['is_hidden', 'origin_key', 'destination_key', 'departure_date', 'price'], name='flightpackage_fare_route_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0018_flightpackage_route_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightpackage',
+            name='similar_stale',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='flightpackage',
+            index=models.Index(condition=models.Q(('similar_stale', True)), fields=['similar_stale'], name='flightpackage_stale_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.4 on 2026-10-19 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def clear_fare_calendar(apps, schema_editor):
+    # Days keyed on free text cannot be mapped onto airports; 0021 rebuilds them on the new keys.
+    apps.get_model('flights', 'FareCalendarDay').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0019_flightpackage_similar_stale'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_fare_calendar, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='farecalendarday',
+            name='unique_fare_calendar_day',
+        ),
+        migrations.RemoveField(
+            model_name='farecalendarday',
+            name='destination_key',
+        ),
+        migrations.RemoveField(
+            model_name='farecalendarday',
+            name='origin_key',
+        ),
+        migrations.AddField(
+            model_name='farecalendarday',
+            name='destination_airport',
+            field=models.ForeignKey(default=None, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='flights.airport'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='farecalendarday',
+            name='origin_airport',
+            field=models.ForeignKey(default=None, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='flights.airport'),
+            preserve_default=False,
+        ),
+        migrations.AddConstraint(
+            model_name='farecalendarday',
+            constraint=models.UniqueConstraint(fields=('origin_airport', 'destination_airport', 'day'), name='unique_fare_calendar_day'),
+        ),
+        migrations.RemoveIndex(
+            model_name='flightpackage',
+            name='flightpackage_fare_route_idx',
+        ),
+        migrations.RemoveField(
+            model_name='flightpackage',
+            name='destination_key',
+        ),
+        migrations.RemoveField(
+            model_name='flightpackage',
+            name='origin_key',
+        ),
+        migrations.AddIndex(
+            model_name='flightpackage',
+            index=models.Index(fields=['is_hidden', 'origin_airport', 'destination_airport', 'departure_date', 'price'], name='flightpackage_fare_route_idx'),
+        ),
+    ]
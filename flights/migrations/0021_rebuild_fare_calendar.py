@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def rebuild_fare_calendar(apps, schema_editor):
+    FlightPackage = apps.get_model('flights', 'FlightPackage')
+    FareCalendarDay = apps.get_model('flights', 'FareCalendarDay')
+    days = []
+    current = None
+    rows = (FlightPackage.objects.filter(is_hidden=False, origin_airport__isnull=False,
+                                         destination_airport__isnull=False)
+            .order_by('origin_airport_id', 'destination_airport_id', 'departure_date', 'price', 'id')
+            .values_list('origin_airport_id', 'destination_airport_id', 'departure_date', 'price', 'id'))
+    for origin_airport_id, destination_airport_id, day, price, package_id in rows.iterator():
+        if current is not None and (current.origin_airport_id, current.destination_airport_id, current.day) == \
+                (origin_airport_id, destination_airport_id, day):
+            current.package_count += 1
+            continue
+        current = FareCalendarDay(origin_airport_id=origin_airport_id, destination_airport_id=destination_airport_id,
+                                  day=day, min_price=price, package_id=package_id, package_count=1)
+        days.append(current)
+    FareCalendarDay.objects.bulk_create(days, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0020_farecalendarday_airports'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_fare_calendar, migrations.RunPython.noop),
+    ]
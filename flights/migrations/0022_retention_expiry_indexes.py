@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0021_rebuild_fare_calendar'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookingapplication',
+            index=models.Index(condition=models.Q(('is_hidden', True)), fields=['date_hidden'], name='bookingapplication_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(condition=models.Q(('is_hidden', True)), fields=['date_hidden'], name='contactmessage_expiry_idx'),
+        ),
+    ]
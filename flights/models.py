@@ -1,12 +1,73 @@
 import datetime
+import html
+import re
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
 
 from django_ckeditor_5.fields import CKEditor5Field
 
 
+class Airport(models.Model):
+    iata_code = models.CharField(max_length=3, unique=True, null=True, blank=True)
+    name = models.CharField(max_length=255, blank=True, default='')
+    city = models.CharField(max_length=255)
+    country = models.CharField(max_length=255, blank=True, default='')
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'{self.city} ({self.iata_code})' if self.iata_code else self.city
+
+
+class AirportAlias(models.Model):
+    """Normalized spelling (lowercase, single spaces) that resolves to an airport, e.g. 'lagos', 'los', 'ikeja'."""
+    alias = models.CharField(max_length=255, unique=True)
+    airport = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='aliases')
+
+    objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['alias'], name='airportalias_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return self.alias
+
+
+class Airline(models.Model):
+    iata_code = models.CharField(max_length=2, unique=True, null=True, blank=True)
+    name = models.CharField(max_length=255)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return self.name
+
+
+class AirlineAlias(models.Model):
+    """Normalized spelling (lowercase, single spaces) that resolves to an airline."""
+    alias = models.CharField(max_length=255, unique=True)
+    airline = models.ForeignKey(Airline, on_delete=models.CASCADE, related_name='aliases')
+
+    objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['alias'], name='airlinealias_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return self.alias
+
+
 class FlightPackage(models.Model):
+    COUNTER_FIELDS = ('total_bookings', 'total_passengers', 'recent_bookings', 'recent_passengers')
+
     name = models.CharField(max_length=255)
     flight_mode = models.CharField(max_length=255, choices=[
         ('one_way', 'One Way'),
@@ -25,15 +86,54 @@ class FlightPackage(models.Model):
     airline = models.CharField(max_length=255)
     departure_date = models.DateField()
     return_date = models.DateField(null=True, blank=True)
+    # Resolved from origin, destination and airline on save, see flights.reference
+    origin_airport = models.ForeignKey(Airport, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                       related_name='departing_packages')
+    destination_airport = models.ForeignKey(Airport, on_delete=models.SET_NULL, null=True, blank=True,
+                                            editable=False, related_name='arriving_packages')
+    airline_ref = models.ForeignKey(Airline, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                    related_name='packages')
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
     is_hidden = models.BooleanField(default=False)
+    date_hidden = models.DateTimeField(null=True, blank=True)
+    # Denormalized demand counters over active bookings, see flights.analytics
+    total_bookings = models.IntegerField(default=0, editable=False)
+    total_passengers = models.IntegerField(default=0, editable=False)
+    recent_bookings = models.IntegerField(default=0, editable=False)
+    recent_passengers = models.IntegerField(default=0, editable=False)
+    # Set when the package or a neighbour changes; cleared by compute_similar_packages --stale
+    similar_stale = models.BooleanField(default=False, editable=False)
 
     objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_hidden', '-recent_bookings', '-total_bookings'], name='flightpackage_popular_idx'),
+            models.Index(fields=['is_hidden', 'departure_date', 'price'], name='flightpackage_departure_idx'),
+            models.Index(fields=['is_hidden', 'price'], name='flightpackage_price_idx'),
+            models.Index(fields=['is_hidden', 'return_date'], name='flightpackage_return_idx'),
+            models.Index(fields=['is_hidden', '-date_created'], name='flightpackage_newest_idx'),
+            models.Index(fields=['is_hidden', 'origin_airport', 'destination_airport'], name='flightpackage_route_idx'),
+            models.Index(fields=['is_hidden', 'origin_airport', 'destination_airport', 'departure_date', 'price'],
+                         name='flightpackage_fare_route_idx'),
+            models.Index(fields=['similar_stale'], condition=models.Q(similar_stale=True),
+                         name='flightpackage_stale_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # The counters are only written by F() updates, see flights.analytics; a full-row save of an instance
+        # loaded earlier would put its stale values back.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [field.attname for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.attname not in deferred
+                                       and field.attname not in self.COUNTER_FIELDS]
+        super().save(*args, **kwargs)
+
     def count(self):
         return self.objects.all().count()
 
@@ -54,9 +154,17 @@ class BookingApplication(models.Model):
     nationality = models.CharField(max_length=255)
     date_booked = models.DateTimeField(auto_now_add=True)
     is_hidden = models.BooleanField(default=False)
+    date_hidden = models.DateTimeField(null=True, blank=True)
 
     objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            # Archived rows past retention, see flights.retention
+            models.Index(fields=['date_hidden'], condition=models.Q(is_hidden=True),
+                         name='bookingapplication_expiry_idx'),
+        ]
+
     def full_name(self):
         return f'{self.first_name} {self.last_name}'
 
@@ -72,20 +180,156 @@ class BookingApplication(models.Model):
 
 
 class ContactMessage(models.Model):
+    PREVIEW_LENGTH = 200
+
     full_name = models.CharField(max_length=255)
     email = models.EmailField()
     message = CKEditor5Field()
+    # Computed from `message` when it is written, see `preview_fields`
+    message_preview = models.CharField(max_length=255, blank=True, default='', editable=False)
+    message_length = models.PositiveIntegerField(default=0, editable=False)
+    message_size = models.PositiveIntegerField(default=0, editable=False)
+    image_count = models.PositiveIntegerField(default=0, editable=False)
     date_sent = models.DateTimeField(auto_now_add=True)
     is_hidden = models.BooleanField(default=False)
+    date_hidden = models.DateTimeField(null=True, blank=True)
 
     objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            # Archived rows past retention, see flights.retention
+            models.Index(fields=['date_hidden'], condition=models.Q(is_hidden=True), name='contactmessage_expiry_idx'),
+        ]
+
     def __str__(self):
         return self.full_name
 
+    @classmethod
+    def preview_fields(cls, message):
+        """Plain-text preview and size metadata of a rich HTML message."""
+        message = message or ''
+        text = re.sub(r'<(script|style)\b.*?</\1\s*>', ' ', message, flags=re.IGNORECASE | re.DOTALL)
+        # Strip again after unescaping so escaped markup such as '&lt;img onerror=...&gt;' cannot come back live.
+        text = ' '.join(strip_tags(html.unescape(strip_tags(text))).split())
+        return {
+            'message_preview': Truncator(text).chars(cls.PREVIEW_LENGTH),
+            'message_length': len(text),
+            'message_size': len(message.encode('utf-8')),
+            'image_count': len(re.findall(r'<img\b', message, flags=re.IGNORECASE)),
+        }
+
+    def refresh_preview(self):
+        for field, value in self.preview_fields(self.message).items():
+            setattr(self, field, value)
+
     def count(self):
         return self.objects.all().count()
 
     def recent_count(self):
         one_week_ago = timezone.now() - datetime.timedelta(days=7)
         return self.objects.filter(date_sent__gte=one_week_ago).count()
+
+
+class ArchivedRecord(models.Model):
+    """Cold storage for archived rows moved out of their hot table by the retention job."""
+    model_label = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    date_hidden = models.DateTimeField(null=True, blank=True)
+    date_moved = models.DateTimeField(auto_now_add=True)
+
+    objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model_label', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f'{self.model_label}#{self.object_id}'
+
+
+class BookingRollup(models.Model):
+    """Bookings and passengers per package and period, maintained incrementally as bookings arrive."""
+    GRANULARITY_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+    ]
+
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    period_start = models.DateField()
+    package = models.ForeignKey(FlightPackage, on_delete=models.CASCADE, related_name='booking_rollups')
+    destination = models.CharField(max_length=255)
+    airline = models.CharField(max_length=255)
+    bookings = models.IntegerField(default=0)
+    passengers = models.IntegerField(default=0)
+
+    objects = models.Manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'period_start', 'package'], name='unique_booking_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'period_start']),
+        ]
+
+    def __str__(self):
+        return f'{self.package_id} {self.granularity} {self.period_start}'
+
+
+class FareCalendarDay(models.Model):
+    """Lowest active package price per route and departure day, refreshed whenever packages change."""
+    origin_airport = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    destination_airport = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    package = models.ForeignKey(FlightPackage, on_delete=models.CASCADE, related_name='fare_calendar_days')
+    package_count = models.PositiveIntegerField(default=1)
+
+    objects = models.Manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['origin_airport', 'destination_airport', 'day'],
+                                    name='unique_fare_calendar_day'),
+        ]
+
+    def __str__(self):
+        return f'{self.origin_airport_id} -> {self.destination_airport_id} {self.day}: {self.min_price}'
+
+
+class SimilarPackage(models.Model):
+    """Precomputed top-N similar active packages per package, see flights.recommendations."""
+    package = models.ForeignKey(FlightPackage, on_delete=models.CASCADE, related_name='similar_packages')
+    similar = models.ForeignKey(FlightPackage, on_delete=models.CASCADE, related_name='recommended_for')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    objects = models.Manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['package', 'rank'], name='unique_similar_package_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.package_id} -> {self.similar_id} ({self.score:.2f})'
+
+
+class IdempotencyRecord(models.Model):
+    """Outcome of a create request sent with an Idempotency-Key header, replayed when the client retries it.
+
+    The unique key is the safety net behind the cache: concurrent or cache-missed retries cannot create twice.
+    """
+    key = models.CharField(max_length=300, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    date_created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return self.key
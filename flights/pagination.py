@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class PopularPackagePagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
+class PackageSearchPagination(CursorPagination):
+    """Keyset pagination over the ordering chosen by the search request (`view.search_ordering`)."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        return view.search_ordering
@@ -0,0 +1,161 @@
+"""
+Monthly range partitioning of `BookingApplication` on `date_booked` (PostgreSQL only).
+
+The ORM keeps treating `id` as the primary key; the physical key is `(id, date_booked)` because Postgres requires
+the partition key in every unique constraint on a partitioned table. Ids still come from a single identity sequence,
+so they stay unique across partitions.
+"""
+import datetime
+
+from django.db import transaction
+
+TABLE = 'flights_bookingapplication'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return datetime.date(month.year + years, month_index + 1, 1)
+
+
+def parse_month(value):
+    """Parse a `YYYY-MM` string into the first day of that month."""
+    return datetime.datetime.strptime(value, '%Y-%m').date()
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def partition_month(name):
+    """Inverse of `partition_name`; returns None for the default partition or unrelated tables."""
+    prefix = f'{TABLE}_p'
+    if not name.startswith(prefix):
+        return None
+    try:
+        return datetime.datetime.strptime(name[len(prefix):], '%Y%m').date()
+    except ValueError:
+        return None
+
+
+def month_bounds(month):
+    start = datetime.datetime(month.year, month.month, 1, tzinfo=datetime.timezone.utc)
+    next_month = add_months(month, 1)
+    end = datetime.datetime(next_month.year, next_month.month, 1, tzinfo=datetime.timezone.utc)
+    return start, end
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s',
+            [TABLE])
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection):
+    """Return `(name, bound expression)` for every attached partition."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) '
+            'FROM pg_inherits i '
+            'JOIN pg_class parent ON parent.oid = i.inhparent '
+            'JOIN pg_class child ON child.oid = i.inhrelid '
+            'WHERE parent.relname = %s ORDER BY child.relname',
+            [TABLE])
+        return cursor.fetchall()
+
+
+def create_month_partition(connection, month):
+    """Create and attach the partition for `month`. Returns False if it already exists.
+
+    The table is created standalone, filled with any rows of that month that already landed in the default
+    partition, and then attached. ATTACH takes a SHARE UPDATE EXCLUSIVE lock on the parent, but an ACCESS EXCLUSIVE
+    lock on the default partition, which it scans to check that no rows of the new range are left there; reads and
+    writes of default-partition rows wait for that scan. Creating partitions ahead of time (see the
+    create_booking_partitions command) keeps the default partition, and so the scan, small.
+    """
+    name = partition_name(month)
+    if name in dict(list_partitions(connection)):
+        return False
+    start, end = month_bounds(month)
+    quote = connection.ops.quote_name
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} '
+            f'WHERE date_booked >= %s AND date_booked < %s RETURNING *) '
+            f'INSERT INTO {quote(name)} SELECT * FROM moved',
+            [start, end])
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)',
+            [start, end])
+    return True
+
+
+def ensure_month_partitions(connection, first_month, last_month):
+    """Create every missing monthly partition from `first_month` to `last_month` inclusive."""
+    created = []
+    month = month_start(first_month)
+    while month <= last_month:
+        if create_month_partition(connection, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def detach_month_partition(connection, month, concurrently=False, drop=False):
+    """Detach the partition for `month` so it can be archived or dropped without touching live data.
+
+    `concurrently` uses DETACH PARTITION CONCURRENTLY (Postgres 14+), which must run outside a transaction.
+    """
+    name = partition_name(month)
+    if name not in dict(list_partitions(connection)):
+        return False
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}{' CONCURRENTLY' if concurrently else ''}")
+        if drop:
+            cursor.execute(f'DROP TABLE {quote(name)}')
+    return True
+
+
+def convert_to_partitioned(connection, months_ahead=3):
+    """Rebuild the bookings table as a partitioned table and copy the existing rows into it."""
+    quote = connection.ops.quote_name
+    old_table = f'{TABLE}_unpartitioned'
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(old_table)}')
+        cursor.execute(
+            f'CREATE TABLE {quote(TABLE)} (LIKE {quote(old_table)} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (date_booked)')
+        cursor.execute(f'CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} DEFAULT')
+        cursor.execute(f'SELECT MIN(date_booked) FROM {quote(old_table)}')
+        oldest = cursor.fetchone()[0]
+
+    this_month = month_start(datetime.datetime.now(datetime.timezone.utc).date())
+    first_month = month_start(oldest.astimezone(datetime.timezone.utc).date()) if oldest else this_month
+    ensure_month_partitions(connection, first_month, add_months(this_month, months_ahead))
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(old_table)}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f'COALESCE((SELECT MAX(id) FROM {quote(old_table)}), 0) + 1, false)',
+            [TABLE])
+        cursor.execute(f'DROP TABLE {quote(old_table)}')
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD PRIMARY KEY (id, date_booked)')
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(TABLE + "_package_id_fk")} '
+            f'FOREIGN KEY (package_id) REFERENCES {quote("flights_flightpackage")} (id) DEFERRABLE INITIALLY DEFERRED')
+        cursor.execute(f'CREATE INDEX {quote(TABLE + "_package_id_idx")} ON {quote(TABLE)} (package_id)')
+        cursor.execute(
+            f'CREATE INDEX {quote(TABLE + "_hidden_booked_idx")} ON {quote(TABLE)} (is_hidden, date_booked)')
@@ -0,0 +1,126 @@
+"""
+"Similar packages" recommendations.
+
+Similarity favours the same destination and origin, nearby departure dates, similar prices and the same or an
+adjacent flight class. The catalog is loaded once into parallel column lists and each package is scored against
+all of them in a single pass, so a full rebuild costs one query plus O(n^2) arithmetic, and serving is a single
+indexed lookup in `SimilarPackage`.
+
+Saving or deleting a package does no scoring: it only flags the package and its likely neighbours
+`similar_stale`, and `compute_similar_packages --stale` recomputes the flagged ones against one catalog snapshot.
+"""
+import heapq
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import FlightPackage, SimilarPackage
+
+TOP_N = 6
+# Same-destination packages flagged stale when a neighbour changes; the rest catch up on the next full rebuild.
+MAX_NEIGHBOUR_REFRESH = 100
+CLASS_LEVELS = {'economy': 0, 'economy_plus': 1, 'business': 2, 'first_class': 3}
+DATE_WINDOW_DAYS = 30.0
+WEIGHTS = {
+    'destination': 3.0,
+    'origin': 1.5,
+    'date': 2.0,
+    'price': 2.0,
+    'flight_class': 1.0,
+    'flight_mode': 0.5,
+}
+
+
+class Catalog:
+    """Column-oriented snapshot of the active packages."""
+
+    def __init__(self):
+        rows = list(FlightPackage.objects.filter(is_hidden=False).order_by('pk').values_list(
+            'pk', 'origin_airport_id', 'destination_airport_id', 'departure_date', 'price', 'flight_class',
+            'flight_mode'))
+        self.ids = [row[0] for row in rows]
+        self.origins = [row[1] for row in rows]
+        self.destinations = [row[2] for row in rows]
+        self.days = [row[3].toordinal() for row in rows]
+        self.prices = [float(row[4]) for row in rows]
+        self.classes = [CLASS_LEVELS.get(row[5], 0) for row in rows]
+        self.modes = [row[6] for row in rows]
+        self.positions = {pk: position for position, pk in enumerate(self.ids)}
+
+    def scores(self, position):
+        origin, destination = self.origins[position], self.destinations[position]
+        day, price = self.days[position], self.prices[position]
+        level, mode = self.classes[position], self.modes[position]
+        return [
+            WEIGHTS['destination'] * (destination is not None and other_destination == destination)
+            + WEIGHTS['origin'] * (origin is not None and other_origin == origin)
+            + WEIGHTS['date'] * max(0.0, 1.0 - abs(other_day - day) / DATE_WINDOW_DAYS)
+            + WEIGHTS['price'] * (1.0 - abs(other_price - price) / max(other_price, price, 1.0))
+            + WEIGHTS['flight_class'] * (1.0 - abs(other_level - level) / 3.0)
+            + WEIGHTS['flight_mode'] * (other_mode == mode)
+            for other_origin, other_destination, other_day, other_price, other_level, other_mode in zip(
+                self.origins, self.destinations, self.days, self.prices, self.classes, self.modes)
+        ]
+
+    def top_similar(self, pk, limit=TOP_N):
+        position = self.positions.get(pk)
+        if position is None:
+            return []
+        scores = self.scores(position)
+        best = heapq.nlargest(limit + 1, range(len(scores)), key=lambda other: (scores[other], -self.ids[other]))
+        return [(self.ids[other], scores[other]) for other in best if other != position][:limit]
+
+
+def _similar_rows(catalog, pk, limit):
+    return [SimilarPackage(package_id=pk, similar_id=similar_id, score=round(score, 4), rank=rank)
+            for rank, (similar_id, score) in enumerate(catalog.top_similar(pk, limit), start=1)]
+
+
+def rebuild_similar_packages(limit=TOP_N):
+    """Recompute every active package's recommendations. Returns the number of rows written."""
+    catalog = Catalog()
+    rows = []
+    for pk in catalog.ids:
+        rows.extend(_similar_rows(catalog, pk, limit))
+    with transaction.atomic():
+        SimilarPackage.objects.all().delete()
+        SimilarPackage.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def refresh_similar_packages(package_ids, limit=TOP_N):
+    """Recompute the recommendations of `package_ids` only; archived or deleted ids just lose theirs."""
+    catalog = Catalog()
+    rows = []
+    for pk in package_ids:
+        rows.extend(_similar_rows(catalog, pk, limit))
+    with transaction.atomic():
+        SimilarPackage.objects.filter(package_id__in=package_ids).delete()
+        SimilarPackage.objects.bulk_create(rows)
+
+
+def refresh_stale_similar_packages(limit=TOP_N):
+    """Recompute the recommendations of the packages flagged stale. Returns the number of packages refreshed."""
+    package_ids = list(FlightPackage.objects.filter(similar_stale=True).values_list('pk', flat=True))
+    if not package_ids:
+        return 0
+    # Cleared in a statement of its own before the catalog is read, so no package row stays locked while scoring
+    # and an edit committed meanwhile flags its package again for the next run. Scoring runs outside any
+    # transaction; refresh_similar_packages only writes the new rows in a short one.
+    FlightPackage.objects.filter(pk__in=package_ids).update(similar_stale=False)
+    try:
+        refresh_similar_packages(package_ids, limit)
+    except Exception:
+        FlightPackage.objects.filter(pk__in=package_ids).update(similar_stale=True)
+        raise
+    return len(package_ids)
+
+
+def mark_similar_stale(package, previous_destination_id=None):
+    """Flag the changed package and the neighbours most likely to rank it differently, in one UPDATE."""
+    stale = Q(pk=package.pk) | Q(pk__in=SimilarPackage.objects.filter(similar_id=package.pk).values('package_id'))
+    destinations = {package.destination_airport_id, previous_destination_id} - {None}
+    if destinations:
+        stale |= Q(pk__in=FlightPackage.objects.filter(is_hidden=False, destination_airport_id__in=destinations)
+                   .order_by('-date_created').values('pk')[:MAX_NEIGHBOUR_REFRESH])
+    FlightPackage.objects.filter(stale).update(similar_stale=True)
@@ -0,0 +1,158 @@
+import re
+
+from django.db import IntegrityError, transaction
+
+from .catalog import bump_catalog_version
+from .fares import rebuild_fare_calendar
+from .models import Airline, AirlineAlias, Airport, AirportAlias, FlightPackage
+
+# 'Lagos (LOS)', 'Air Peace (P4)'
+CODE_SUFFIX = re.compile(r'^(?P<name>.*?)\s*\((?P<code>[a-z0-9]+)\)$')
+AIRPORT_PACKAGE_FIELDS = ('origin_airport', 'destination_airport')
+AIRLINE_PACKAGE_FIELDS = ('airline_ref',)
+
+
+def normalize_alias(value):
+    return ' '.join((value or '').split()).lower()
+
+
+def _add_alias(alias_model, reference_field, alias, reference_id):
+    try:
+        with transaction.atomic():
+            alias_model.objects.create(alias=alias, **{f'{reference_field}_id': reference_id})
+    except IntegrityError:
+        pass
+
+
+def _find(reference_model, alias_model, reference_field, code_length, alias):
+    """(id, matched by IATA code) of the reference the normalized `alias` names, or (None, False)."""
+    reference_id = alias_model.objects.filter(alias=alias).values_list(f'{reference_field}_id', flat=True).first()
+    if reference_id is not None:
+        return reference_id, False
+    match = CODE_SUFFIX.match(alias)
+    for code in (alias, match and match['code']):
+        if code and len(code) == code_length:
+            reference_id = reference_model.objects.filter(iata_code=code.upper()).values_list('id', flat=True).first()
+            if reference_id is not None:
+                return reference_id, True
+    return None, False
+
+
+def _resolve(reference_model, alias_model, reference_field, code_length, value, **defaults):
+    """Return the id of the reference row `value` is an alias or IATA code of, creating both if needed."""
+    alias = normalize_alias(value)
+    if not alias:
+        return None
+    reference_id, by_code = _find(reference_model, alias_model, reference_field, code_length, alias)
+    if by_code:
+        # Remember the spelling so the next lookup, and search, find it directly.
+        _add_alias(alias_model, reference_field, alias, reference_id)
+    if reference_id is not None:
+        return reference_id
+    try:
+        with transaction.atomic():
+            reference = reference_model.objects.create(**defaults)
+            alias_model.objects.create(alias=alias, **{reference_field: reference})
+            return reference.pk
+    except IntegrityError:
+        # Another request registered the same alias first.
+        return alias_model.objects.filter(alias=alias).values_list(f'{reference_field}_id', flat=True).first()
+
+
+def resolve_airport(value):
+    return _resolve(Airport, AirportAlias, 'airport', 3, value, city=' '.join(value.split()))
+
+
+def find_airport(value):
+    """Id of the airport `value` is an alias or IATA code of, without registering anything; None if unknown."""
+    alias = normalize_alias(value)
+    return _find(Airport, AirportAlias, 'airport', 3, alias)[0] if alias else None
+
+
+def resolve_airline(value):
+    return _resolve(Airline, AirlineAlias, 'airline', 2, value, name=' '.join(value.split()))
+
+
+def matching_airport_ids(text):
+    """Ids of airports whose IATA code equals `text` or that have an alias starting with it (index prefix scan)."""
+    alias = normalize_alias(text)
+    if not alias:
+        return []
+    ids = set(AirportAlias.objects.filter(alias__startswith=alias).values_list('airport_id', flat=True))
+    if len(alias) == 3:
+        ids.update(Airport.objects.filter(iata_code=alias.upper()).values_list('id', flat=True))
+    return list(ids)
+
+
+def matching_airline_ids(text):
+    alias = normalize_alias(text)
+    if not alias:
+        return []
+    ids = set(AirlineAlias.objects.filter(alias__startswith=alias).values_list('airline_id', flat=True))
+    if len(alias) == 2:
+        ids.update(Airline.objects.filter(iata_code=alias.upper()).values_list('id', flat=True))
+    return list(ids)
+
+
+def _merge(reference_model, alias_model, reference_field, package_fields, source_ids, target_id):
+    """Fold the `source_ids` references into `target_id`: their aliases and packages move over, then they go."""
+    source_ids = set(source_ids) - {target_id}
+    if not source_ids:
+        return 0
+    with transaction.atomic():
+        alias_model.objects.filter(**{f'{reference_field}_id__in': source_ids}).update(
+            **{f'{reference_field}_id': target_id})
+        for field in package_fields:
+            FlightPackage.objects.filter(**{f'{field}_id__in': source_ids}).update(**{f'{field}_id': target_id})
+        reference_model.objects.filter(pk__in=source_ids).delete()
+        transaction.on_commit(bump_catalog_version)
+    return len(source_ids)
+
+
+def merge_airports(source_ids, target_id):
+    with transaction.atomic():
+        merged = _merge(Airport, AirportAlias, 'airport', AIRPORT_PACKAGE_FIELDS, source_ids, target_id)
+        if merged:
+            # The merged airports' calendar days went with them; their packages now fly from or to the target.
+            rebuild_fare_calendar(airport_id=target_id)
+    return merged
+
+
+def merge_airlines(source_ids, target_id):
+    return _merge(Airline, AirlineAlias, 'airline', AIRLINE_PACKAGE_FIELDS, source_ids, target_id)
+
+
+def _load(reference_model, alias_model, reference_field, merge, code, aliases, **fields):
+    """Upsert the reference with IATA `code` and attach `aliases` to it.
+
+    An alias held by a reference without a code (auto-created from free text) is taken over by merging that
+    reference in. An alias already held by another coded reference is left alone; the first loaded row wins, so
+    order the data by how strongly a spelling belongs to it. Returns (created, merged, skipped aliases).
+    """
+    with transaction.atomic():
+        reference, created = reference_model.objects.update_or_create(iata_code=code, defaults=fields)
+        merged, skipped = 0, 0
+        for alias in dict.fromkeys(normalize_alias(alias) for alias in aliases):
+            if not alias:
+                continue
+            holder = (alias_model.objects.filter(alias=alias)
+                      .values_list(f'{reference_field}_id', f'{reference_field}__iata_code').first())
+            if holder is None:
+                alias_model.objects.create(alias=alias, **{reference_field: reference})
+            elif holder[0] != reference.pk and holder[1] is None:
+                merged += merge([holder[0]], reference.pk)
+            elif holder[0] != reference.pk:
+                skipped += 1
+    return created, merged, skipped
+
+
+def load_airport(code, name, city, country='', aliases=()):
+    code = code.strip().upper()
+    return _load(Airport, AirportAlias, 'airport', merge_airports, code,
+                 [city, name, f'{city} ({code})', *aliases], name=name, city=city, country=country)
+
+
+def load_airline(code, name, aliases=()):
+    code = code.strip().upper()
+    return _load(Airline, AirlineAlias, 'airline', merge_airlines, code, [name, f'{name} ({code})', *aliases],
+                 name=name)
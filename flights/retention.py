@@ -0,0 +1,78 @@
+import datetime
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedRecord
+
+logger = logging.getLogger(__name__)
+
+RETENTION_ACTIONS = ('purge', 'move')
+# Leaf models only: deleting a FlightPackage would cascade to its bookings (active ones included), rollups, fare
+# calendar days and recommendations.
+RETENTION_MODELS = ('flights.BookingApplication', 'flights.ContactMessage')
+
+
+def get_retention_policies():
+    return getattr(settings, 'FLIGHTS_RETENTION_POLICIES', {})
+
+
+def expired_archived_queryset(model, days):
+    """Archived rows hidden more than `days` ago, found through the model's partial `date_hidden` index."""
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    return model.objects.filter(is_hidden=True, date_hidden__lt=cutoff).order_by('pk')
+
+
+def apply_retention_policy(label, policy, batch_size=500, sleep=0.0, dry_run=False):
+    """Purge or move archived rows of `label` older than the policy's `days`, one committed batch at a time.
+
+    Returns a dict of metrics for the run.
+    """
+    if label not in RETENTION_MODELS:
+        raise ValueError(f"Retention policies are only supported for {', '.join(RETENTION_MODELS)}, not {label}")
+    action = policy.get('action', 'purge')
+    if action not in RETENTION_ACTIONS:
+        raise ValueError(f"Unknown retention action '{action}' for {label}")
+    model = apps.get_model(label)
+    queryset = expired_archived_queryset(model, policy['days'])
+    stats = {'model': label, 'action': action, 'days': policy['days'], 'matched': 0, 'moved': 0, 'purged': 0,
+             'batches': 0}
+
+    if dry_run:
+        stats['matched'] = queryset.count()
+        return stats
+
+    started = time.monotonic()
+    last_pk = None
+    while True:
+        with transaction.atomic():
+            # Keyset on pk: each batch starts after the last one instead of rescanning the rows already handled.
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(batch.select_for_update(skip_locked=True)[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+            if action == 'move':
+                ArchivedRecord.objects.bulk_create([
+                    ArchivedRecord(model_label=label, object_id=entry['pk'], data=entry['fields'],
+                                   date_hidden=row.date_hidden)
+                    for row, entry in zip(rows, serializers.serialize('python', rows))
+                ])
+            model.objects.filter(pk__in=[row.pk for row in rows]).delete()
+
+        stats['matched'] += len(rows)
+        stats['moved' if action == 'move' else 'purged'] += len(rows)
+        stats['batches'] += 1
+        logger.info('Retention %s %s: batch %d, %d rows', action, label, stats['batches'], len(rows))
+        if len(rows) < batch_size:
+            break
+        if sleep:
+            time.sleep(sleep)
+
+    stats['seconds'] = round(time.monotonic() - started, 3)
+    return stats
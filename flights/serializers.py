@@ -1,9 +1,31 @@
+import datetime
+from decimal import Decimal
+
 from django.contrib.auth.models import User
+from django.utils import timezone
 from rest_framework import serializers
-from .models import FlightPackage, BookingApplication, ContactMessage
+from .models import FlightPackage, BookingApplication, ContactMessage, FareCalendarDay
+
+
+class SparseFieldsetSerializerMixin:
+    """Only serialize the field names in the `sparse_fields` context entry, when one is given.
+
+    Nested serializers are left untouched so `?fields=package` still returns the whole embedded package.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.context.get('sparse_fields')
+        if selected is not None and self.is_top_level():
+            fields = {name: field for name, field in fields.items() if name in selected}
+        return fields
 
+    def is_top_level(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
 
-class FlightPackageSerializer(serializers.ModelSerializer):
+
+class FlightPackageSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = FlightPackage
@@ -11,6 +33,15 @@ class FlightPackageSerializer(serializers.ModelSerializer):
                   'airline', 'departure_date', 'return_date']
         read_only_fields = ['date_created', 'date_updated', 'is_hidden']
 
+
+class PopularFlightPackageSerializer(FlightPackageSerializer):
+
+    class Meta(FlightPackageSerializer.Meta):
+        fields = FlightPackageSerializer.Meta.fields + ['total_bookings', 'total_passengers', 'recent_bookings',
+                                                        'recent_passengers']
+        read_only_fields = fields
+
+
 def validate_return_date(self, return_date):
     if 'departure_date' in self.initial_data:
         departure_date = self.initial_data['departure_date']
@@ -18,7 +49,7 @@ def validate_return_date(self, return_date):
             raise serializers.ValidationError("Return date must be later than departure date.")
     return return_date
 
-class BookingApplicationSerializer(serializers.ModelSerializer):
+class BookingApplicationSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     package = serializers.PrimaryKeyRelatedField(queryset=FlightPackage.objects.filter(is_hidden=False))
 
     class Meta:
@@ -28,13 +59,97 @@ class BookingApplicationSerializer(serializers.ModelSerializer):
         read_only_fields = ['date_booked', 'is_hidden']
 
 
-class ContactMessageSerializer(serializers.ModelSerializer):
+class ExpandedBookingApplicationSerializer(BookingApplicationSerializer):
+    package = FlightPackageSerializer(read_only=True)
+
+
+class ContactMessageSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = ContactMessage
         fields = ['id', 'full_name', 'email', 'message']
         read_only_fields = ['date_sent', 'is_hidden']
 
 
+class ContactMessageListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ContactMessage
+        fields = ['id', 'full_name', 'email', 'message_preview', 'message_length', 'message_size', 'image_count']
+        read_only_fields = fields
+
+
+class PackageSearchQuerySerializer(serializers.Serializer):
+    # Each ordering is served by one of the FlightPackage indexes; `id` breaks ties for stable cursors.
+    ORDERINGS = {
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+        'departure_date': ('departure_date', 'id'),
+        '-departure_date': ('-departure_date', '-id'),
+        'newest': ('-date_created', '-id'),
+    }
+    RANGE_FILTERS = {
+        'min_price': 'price__gte',
+        'max_price': 'price__lte',
+        'departure_from': 'departure_date__gte',
+        'departure_to': 'departure_date__lte',
+        'return_from': 'return_date__gte',
+        'return_to': 'return_date__lte',
+    }
+
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+    departure_from = serializers.DateField(required=False)
+    departure_to = serializers.DateField(required=False)
+    return_from = serializers.DateField(required=False)
+    return_to = serializers.DateField(required=False)
+    ordering = serializers.ChoiceField(choices=list(ORDERINGS), required=False)
+
+    def validate(self, attrs):
+        for low, high in (('min_price', 'max_price'), ('departure_from', 'departure_to'), ('return_from', 'return_to')):
+            if low in attrs and high in attrs and attrs[low] > attrs[high]:
+                raise serializers.ValidationError(f"{low} must not be greater than {high}.")
+        return attrs
+
+    def range_filters(self):
+        return {lookup: self.validated_data[name] for name, lookup in self.RANGE_FILTERS.items()
+                if name in self.validated_data}
+
+
+class FareCalendarQuerySerializer(serializers.Serializer):
+    origin = serializers.CharField(max_length=255)
+    destination = serializers.CharField(max_length=255)
+    month = serializers.DateField(input_formats=['%Y-%m'])
+
+
+class FareCalendarDaySerializer(serializers.ModelSerializer):
+    date = serializers.DateField(source='day')
+    package_id = serializers.IntegerField()
+
+    class Meta:
+        model = FareCalendarDay
+        fields = ['date', 'min_price', 'package_id', 'package_count']
+        read_only_fields = fields
+
+
+class BookingAnalyticsQuerySerializer(serializers.Serializer):
+    MAX_DAYS = {'day': 366, 'week': 366 * 3}
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    granularity = serializers.ChoiceField(choices=['day', 'week'], default='day')
+    group_by = serializers.ChoiceField(choices=['package', 'destination', 'airline'], required=False)
+
+    def validate(self, attrs):
+        end = attrs.setdefault('end', timezone.localdate())
+        start = attrs.setdefault('start', end - datetime.timedelta(days=30))
+        if start > end:
+            raise serializers.ValidationError("Start date must not be later than end date.")
+        if (end - start).days > self.MAX_DAYS[attrs['granularity']]:
+            raise serializers.ValidationError(
+                f"Date range is limited to {self.MAX_DAYS[attrs['granularity']]} days for {attrs['granularity']} "
+                f"granularity.")
+        return attrs
+
+
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
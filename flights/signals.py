@@ -0,0 +1,135 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from .analytics import record_booking, update_package_counters
+from .authentication import invalidate_cached_user
+from .catalog import bump_catalog_version
+from .fares import fare_keys, refresh_fare_day
+from .models import BookingApplication, FlightPackage
+from .recommendations import mark_similar_stale
+from .reference import resolve_airline, resolve_airport
+from .suggest import package_terms, suggest_index
+
+# Sent by ArchiveRestoreListDetailViewSet with `sender` set to the model class and the affected `instance`.
+archived = Signal()
+restored = Signal()
+
+
+@receiver(pre_save, sender=BookingApplication)
+def remember_previous_booking(sender, instance, **kwargs):
+    instance._previous_booking = None
+    if instance.pk is not None:
+        instance._previous_booking = (sender.objects.filter(pk=instance.pk)
+                                      .only('package_id', 'number_of_passengers', 'date_booked', 'is_hidden').first())
+
+
+@receiver(post_save, sender=BookingApplication)
+def booking_created(sender, instance, created, **kwargs):
+    if created and not instance.is_hidden:
+        record_booking(instance)
+        update_package_counters(instance)
+
+
+@receiver(post_save, sender=BookingApplication)
+def booking_updated(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_booking', None)
+    # Archive and restore toggle is_hidden and are accounted for by their own signals.
+    if created or previous is None or previous.is_hidden or instance.is_hidden:
+        return
+    if (previous.package_id, previous.number_of_passengers) == (instance.package_id, instance.number_of_passengers):
+        return
+    record_booking(previous, sign=-1)
+    update_package_counters(previous, sign=-1)
+    record_booking(instance)
+    update_package_counters(instance)
+
+
+@receiver(archived, sender=BookingApplication)
+def booking_archived(sender, instance, **kwargs):
+    record_booking(instance, sign=-1)
+    update_package_counters(instance, sign=-1)
+
+
+@receiver(restored, sender=BookingApplication)
+def booking_restored(sender, instance, **kwargs):
+    record_booking(instance)
+    update_package_counters(instance)
+
+
+@receiver(post_save, sender=FlightPackage)
+@receiver(post_delete, sender=FlightPackage)
+def package_changed(sender, instance, **kwargs):
+    # After commit, so a concurrent read cannot cache pre-commit data under the new version.
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(pre_save, sender=FlightPackage)
+def assign_reference_keys(sender, instance, **kwargs):
+    instance.origin_airport_id = resolve_airport(instance.origin)
+    instance.destination_airport_id = resolve_airport(instance.destination)
+    instance.airline_ref_id = resolve_airline(instance.airline)
+
+
+@receiver(pre_save, sender=FlightPackage)
+def remember_previous_state(sender, instance, **kwargs):
+    instance._previous_state = None
+    if instance.pk is not None:
+        instance._previous_state = (sender.objects.filter(pk=instance.pk)
+                                    .values('origin', 'destination', 'airline', 'departure_date', 'is_hidden',
+                                            'origin_airport_id', 'destination_airport_id').first())
+
+
+@receiver(post_save, sender=FlightPackage)
+def refresh_fare_calendar(sender, instance, **kwargs):
+    keys = {fare_keys(instance)}
+    previous = getattr(instance, '_previous_state', None)
+    if previous:
+        keys.add((previous['origin_airport_id'], previous['destination_airport_id'], previous['departure_date']))
+    for origin_airport_id, destination_airport_id, day in keys:
+        refresh_fare_day(origin_airport_id, destination_airport_id, day)
+
+
+@receiver(post_save, sender=FlightPackage)
+def patch_suggest_index(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_state', None)
+    removed = package_terms(previous['origin'], previous['destination'], previous['airline']) \
+        if previous and not previous['is_hidden'] else {}
+    added = package_terms(instance.origin, instance.destination, instance.airline) if not instance.is_hidden else {}
+    # Registered after package_changed's version bump, so it runs after it.
+    suggest_index.patch_on_commit(removed, added)
+
+
+@receiver(post_save, sender=FlightPackage)
+def flag_similar_packages(sender, instance, **kwargs):
+    # Scoring happens off the request path, in compute_similar_packages --stale.
+    previous = getattr(instance, '_previous_state', None)
+    mark_similar_stale(instance, previous['destination_airport_id'] if previous else None)
+    instance.similar_stale = True
+
+
+@receiver(post_delete, sender=FlightPackage)
+def remove_from_fare_calendar(sender, instance, **kwargs):
+    refresh_fare_day(*fare_keys(instance))
+
+
+@receiver(post_delete, sender=FlightPackage)
+def remove_from_suggest_index(sender, instance, **kwargs):
+    if not instance.is_hidden:
+        suggest_index.patch_on_commit(package_terms(instance.origin, instance.destination, instance.airline), {})
+
+
+@receiver(pre_delete, sender=FlightPackage)
+def flag_similar_packages_before_delete(sender, instance, **kwargs):
+    # Before the cascade removes the rows that tell which packages listed this one.
+    mark_similar_stale(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def drop_cached_user(sender, instance, **kwargs):
+    # Password changes and deactivation must take effect on the next request, not after the cache TTL. After
+    # commit, so a request racing the transaction cannot cache the old row again.
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
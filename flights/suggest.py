@@ -0,0 +1,152 @@
+"""
+In-process prefix index over the origins, destinations and airlines of active flight packages.
+
+The index is a sorted array searched with `bisect`. It is built once per process (before the fork when gunicorn
+runs with --preload, so workers share the pages copy-on-write), patched when packages change in this
+process once the change commits, and rebuilt when another process changes the catalog (detected through the shared
+catalog version).
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.db import transaction
+
+from .catalog import catalog_version
+from .models import FlightPackage
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('origin', 'destination', 'airline')
+
+
+def normalize(value):
+    return ' '.join((value or '').split()).lower()
+
+
+def display(value):
+    return ' '.join((value or '').split())
+
+
+def package_terms(origin, destination, airline):
+    terms = Counter()
+    for kind, value in zip(KINDS, (origin, destination, airline)):
+        if display(value):
+            terms[(kind, display(value))] += 1
+    return terms
+
+
+def label_entries(kind, label):
+    """Index every word start so 'york' also completes 'New York'."""
+    words = normalize(label).split(' ')
+    return [(' '.join(words[position:]), kind, label) for position in range(len(words))]
+
+
+class SuggestIndex:
+    # How often a worker checks the shared catalog version before serving from its copy.
+    version_check_interval = 5.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Sorted (key, kind, label) entries and the number of active packages per (kind, label), swapped together
+        # so readers never need the lock.
+        self._state = ([], Counter())
+        self.version = None
+        self._checked_at = 0.0
+
+    def build(self):
+        version = catalog_version()
+        counts = Counter()
+        rows = FlightPackage.objects.filter(is_hidden=False).values_list('origin', 'destination', 'airline')
+        for origin, destination, airline in rows.iterator():
+            counts.update(package_terms(origin, destination, airline))
+        entries = sorted(entry for term in counts for entry in label_entries(*term))
+        with self._lock:
+            self._state = (entries, counts)
+            self.version = version
+            self._checked_at = time.monotonic()
+
+    def patch(self, removed, added, version):
+        """Apply a committed package change made in this process without rebuilding from the database.
+
+        Only labels that appear or disappear touch the entries, each with a binary-search insert or delete.
+        """
+        with self._lock:
+            entries, counts = self._state
+            counts = counts.copy()
+            counts.subtract(removed)
+            counts.update(added)
+            changed = set(removed) | set(added)
+            gone = [term for term in changed if counts[term] <= 0 and term in self._state[1]]
+            new = [term for term in changed if counts[term] > 0 and term not in self._state[1]]
+            if gone or new:
+                entries = list(entries)
+                for term in gone:
+                    for entry in label_entries(*term):
+                        position = bisect.bisect_left(entries, entry)
+                        if position < len(entries) and entries[position] == entry:
+                            del entries[position]
+                for term in new:
+                    for entry in label_entries(*term):
+                        bisect.insort(entries, entry)
+            self._state = (entries, +counts)
+            self.version = version
+
+    def patch_on_commit(self, removed, added):
+        """Patch once the surrounding transaction commits, so a rolled-back save never reaches the index.
+
+        The patch is skipped when the index has changed in the meantime; the version check then rebuilds it.
+        """
+        if self.version is None:
+            return
+        base_version = self.version
+
+        def apply():
+            if self.version == base_version:
+                self.patch(removed, added, catalog_version())
+        transaction.on_commit(apply)
+
+    def ensure_current(self):
+        now = time.monotonic()
+        if self.version is not None and now - self._checked_at < self.version_check_interval:
+            return
+        self._checked_at = now
+        if self.version != catalog_version():
+            self.build()
+
+    def suggest(self, prefix, kind=None, limit=10):
+        """Completions for `prefix` ranked by the number of active packages, then by label."""
+        self.ensure_current()
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        entries, counts = self._state
+        start = bisect.bisect_left(entries, (prefix,))
+        end = bisect.bisect_left(entries, (prefix + '\uffff',), lo=start)
+        labels = {(entry_kind, label) for _, entry_kind, label in entries[start:end] if not kind or entry_kind == kind}
+        # Spellings that only differ in case are one completion: the most common spelling, with the summed count.
+        matches = {}
+        for entry_kind, label in labels:
+            weight = counts[(entry_kind, label)]
+            best = matches.setdefault((entry_kind, normalize(label)), {'value': label, 'kind': entry_kind, 'count': 0,
+                                                                       'weight': 0})
+            best['count'] += weight
+            if (weight, label) > (best['weight'], best['value']):
+                best['value'], best['weight'] = label, weight
+        ranked = sorted(matches.values(), key=lambda match: (-match['count'], len(match['value']), match['value']))
+        return [{'value': match['value'], 'kind': match['kind'], 'count': match['count']} for match in ranked[:limit]]
+
+
+suggest_index = SuggestIndex()
+
+
+def warm_suggest_index():
+    """Build the index at startup. Startup must not depend on it: when the database or the cache holding the catalog
+    version is unavailable, the index is left to be built on first use.
+    """
+    try:
+        suggest_index.build()
+    except Exception:
+        logger.warning('Could not warm the suggest index; it will be built on first use', exc_info=True)
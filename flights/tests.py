@@ -1,3 +1,799 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from drf_spectacular.generators import SchemaGenerator
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import (Airport, AirportAlias, ArchivedRecord, BookingRollup, FareCalendarDay, FlightPackage,
+                     BookingApplication, ContactMessage, IdempotencyRecord)
+from . import partitions
+from .analytics import reconcile_package_counters
+from .authentication import user_cache_key
+from .catalog import catalog_version
+from .recommendations import rebuild_similar_packages, refresh_stale_similar_packages
+from .reference import load_airport, resolve_airport
+from .retention import apply_retention_policy
+from .suggest import suggest_index, warm_suggest_index
+from .views import FlightPackageCreateUpdateViewSet
+
+
+class BookingApplicationExpandPackageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        for index in range(5):
+            package = FlightPackage.objects.create(
+                name=f'Package {index}', destination='Paris', origin='Lagos', price='450.00', airline='Air France',
+                departure_date=datetime.date(2025, 3, 1))
+            for hidden in (False, True):
+                BookingApplication.objects.create(
+                    package=package, first_name='Ada', last_name='Obi', email='ada@example.com',
+                    number_of_passengers=2, phone_number='08000000000', date_of_birth=datetime.date(1990, 1, 1),
+                    gender='f', nationality='Nigerian', is_hidden=hidden)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_list_embeds_package_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/flight/booking-application/list/', {'expand': 'package'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(response.data[0]['package']['destination'], 'Paris')
+
+    def test_archived_list_embeds_package_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/flight/booking-application/archive/archived_list/', {'expand': 'package'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['archived_count'], 5)
+        self.assertEqual(response.data['data'][0]['package']['airline'], 'Air France')
+
+    def test_list_without_expand_returns_package_id(self):
+        response = self.client.get('/flight/booking-application/list/')
+        self.assertIsInstance(response.data[0]['package'], int)
+
+
+class SparseFieldsetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        FlightPackage.objects.create(name='Lagos to Paris', destination='Paris', origin='Lagos', price='450.00',
+                                     airline='Air France', departure_date=datetime.date(2025, 3, 1))
+        cls.message = ContactMessage.objects.create(full_name='Ada Obi', email='ada@example.com',
+                                                    message='<p>Hello</p>')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_fields_limits_output(self):
+        response = self.client.get('/flight/package/list/', {'fields': 'id,name,price'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data[0]), {'id', 'name', 'price'})
+
+    def test_omit_skips_message_column(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/flight/contact-message/check/{self.message.pk}/', {'omit': 'message'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('message', response.data)
+        self.assertNotIn('"message"', queries.captured_queries[-1]['sql'])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/flight/package/list/', {'fields': 'id,unknown'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ContactMessagePreviewTests(TestCase):
+
+    def test_create_stores_plain_text_preview(self):
+        response = APIClient().post('/flight/contact-message/', {
+            'full_name': 'Ada Obi', 'email': 'ada@example.com',
+            'message': '<p>Hello&nbsp;<b>there</b></p><script>alert(1)</script><img src="a.png">'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        message = ContactMessage.objects.get(pk=response.data['id'])
+        self.assertEqual(message.message_preview, 'Hello there')
+        self.assertEqual(message.message_length, 11)
+        self.assertEqual(message.image_count, 1)
+
+    def test_escaped_markup_does_not_come_back_live(self):
+        preview = ContactMessage.preview_fields('<p>&lt;img src=x onerror=alert(1)&gt;Hi &amp;lt;b&amp;gt;</p>')
+        self.assertNotIn('<img', preview['message_preview'])
+        self.assertEqual(preview['message_preview'], 'Hi &lt;b&gt;')
+
+    def test_list_returns_preview_without_html(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        ContactMessage.objects.create(full_name='Ada Obi', email='ada@example.com', message='<p>Hi</p>',
+                                      **ContactMessage.preview_fields('<p>Hi</p>'))
+        client = APIClient()
+        client.force_authenticate(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/flight/contact-message/check/')
+        self.assertEqual(response.data[0]['message_preview'], 'Hi')
+        self.assertNotIn('message', response.data[0])
+        self.assertNotIn('"message"', queries.captured_queries[-1]['sql'])
+
+
+class SimilarPackageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        def package(name, destination, price, day, **extra):
+            return FlightPackage.objects.create(name=name, destination=destination, origin='Lagos', price=price,
+                                                airline='Air France', departure_date=datetime.date(2025, 3, day),
+                                                **extra)
+        cls.package = package('Paris', 'Paris', '450.00', 1)
+        cls.close = package('Paris later', 'Paris', '470.00', 3)
+        cls.far = package('Dubai', 'Dubai', '1200.00', 28)
+        cls.hidden = package('Paris hidden', 'Paris', '450.00', 1, is_hidden=True)
+        rebuild_similar_packages()
+        FlightPackage.objects.update(similar_stale=False)
+
+    def similar_ids(self):
+        return [item['id'] for item in APIClient().get(f'/flight/package/list/{self.package.pk}/similar/').data]
+
+    def test_similar_ranks_closest_active_package_first_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = APIClient().get(f'/flight/package/list/{self.package.pk}/similar/')
+        self.assertEqual([item['id'] for item in response.data], [self.close.pk, self.far.pk])
+
+    def test_archiving_a_package_removes_it_from_recommendations(self):
+        self.close.is_hidden = True
+        self.close.save()
+        self.assertEqual(self.similar_ids(), [self.far.pk])
+
+    def test_saving_a_package_flags_it_and_its_neighbours_without_scoring(self):
+        self.far.price = '460.00'
+        with mock.patch('flights.recommendations.Catalog') as catalog:
+            self.far.save()
+        catalog.assert_not_called()
+        self.assertEqual(set(FlightPackage.objects.filter(similar_stale=True).values_list('pk', flat=True)),
+                         {self.package.pk, self.close.pk, self.far.pk})
+
+    def test_save_cost_does_not_grow_with_the_catalog(self):
+        def save_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.close.save()
+            return len(queries)
+        before = save_queries()
+        FlightPackage.objects.bulk_create([
+            FlightPackage(name=f'Paris {day}', destination='Paris', origin='Lagos', price='500.00',
+                          airline='Air France', departure_date=datetime.date(2025, 3, day))
+            for day in range(1, 29)])
+        rebuild_similar_packages()
+        with mock.patch('flights.recommendations.Catalog') as catalog:
+            self.assertEqual(save_queries(), before)
+        catalog.assert_not_called()
+
+    def test_stale_refresh_recomputes_flagged_packages_and_clears_the_flags(self):
+        self.far.destination, self.far.price, self.far.departure_date = 'Paris', '450.00', datetime.date(2025, 3, 1)
+        self.far.save()
+        self.assertEqual(self.similar_ids(), [self.close.pk, self.far.pk])
+        out = StringIO()
+        call_command('compute_similar_packages', '--stale', stdout=out)
+        self.assertIn('Refreshed 3 stale packages', out.getvalue())
+        self.assertEqual(self.similar_ids(), [self.far.pk, self.close.pk])
+        self.assertFalse(FlightPackage.objects.filter(similar_stale=True).exists())
+
+    def test_stale_refresh_scores_outside_a_transaction_and_keeps_flags_on_failure(self):
+        self.far.save()
+        depth = len(connection.savepoint_ids)
+        depths = []
+
+        def catalog():
+            depths.append(len(connection.savepoint_ids))
+            raise RuntimeError('scoring failed')
+        with mock.patch('flights.recommendations.Catalog', side_effect=catalog), self.assertRaises(RuntimeError):
+            refresh_stale_similar_packages()
+        self.assertEqual(depths, [depth])
+        self.assertEqual(FlightPackage.objects.filter(similar_stale=True).count(), 3)
+
+    def test_deleting_a_package_flags_the_packages_that_listed_it(self):
+        self.far.delete()
+        self.assertEqual(set(FlightPackage.objects.filter(similar_stale=True).values_list('pk', flat=True)),
+                         {self.package.pk, self.close.pk})
+
+
+class ThrottlingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_contact_messages_from_one_email_are_limited(self):
+        client = APIClient()
+        statuses = [client.post('/flight/contact-message/', {'full_name': 'Ada Obi', 'email': 'Ada@Example.com',
+                                                              'message': 'Hello'}, format='json').status_code
+                    for _ in range(4)]
+        self.assertEqual(statuses, [201, 201, 201, 429])
+
+    def test_login_is_locked_out_after_repeated_failures_without_checking_the_password(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        client = APIClient()
+        for _ in range(10):
+            self.assertEqual(client.post('/admin/login/', {'username': 'admin', 'password': 'wrong'}).status_code, 401)
+        with mock.patch('flights.views.authenticate') as authenticate:
+            response = client.post('/admin/login/', {'username': 'admin', 'password': 'password'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        authenticate.assert_not_called()
+
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}')
+
+    def test_repeated_requests_do_not_load_the_user(self):
+        self.client.get('/flight/booking-applications/count/')
+        with self.assertNumQueries(2):
+            response = self.client.get('/flight/booking-applications/count/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_schema_documents_the_bearer_scheme(self):
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        self.assertEqual(schema['components']['securitySchemes']['jwtAuth']['scheme'], 'bearer')
+
+    def test_deactivation_takes_effect_once_committed(self):
+        self.client.get('/flight/booking-applications/count/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.is_active = False
+            self.admin.save()
+        self.assertEqual(self.client.get('/flight/booking-applications/count/').status_code, 401)
+
+    def test_cache_holds_no_password_hash(self):
+        self.client.get('/flight/booking-applications/count/')
+        self.assertEqual(cache.get(user_cache_key(self.admin.pk)),
+                         {'pk': self.admin.pk, 'is_active': True, 'is_staff': True, 'is_superuser': True})
+
+    def test_password_change_works_with_the_cached_user(self):
+        self.client.get('/flight/booking-applications/count/')
+        response = self.client.post('/admin/update-password/', {'old_password': 'password', 'new_password': 'changed',
+                                                                 'confirm_password': 'changed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.admin.refresh_from_db()
+        self.assertTrue(self.admin.check_password('changed'))
+        self.assertEqual(self.admin.email, 'admin@example.com')
+
+    @mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True)
+    def test_revoked_token_is_rejected_from_the_cache(self):
+        old_token = AccessToken.for_user(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.set_password('changed')
+            self.admin.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}')
+        self.client.get('/flight/booking-applications/count/')
+        self.assertNotIn(self.admin.password, cache.get(user_cache_key(self.admin.pk)).values())
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {old_token}')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/flight/booking-applications/count/').status_code, 401)
+
+
+class IdempotentBookingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        package = FlightPackage.objects.create(name='Paris', destination='Paris', origin='Lagos', price='450.00',
+                                               airline='Air France', departure_date=datetime.date(2025, 3, 1))
+        self.booking = {'package': package.pk, 'first_name': 'Ada', 'last_name': 'Obi', 'email': 'ada@example.com',
+                        'number_of_passengers': 2, 'phone_number': '08000000000', 'date_of_birth': '1990-01-01',
+                        'gender': 'f', 'nationality': 'Nigerian'}
+        self.client = APIClient(HTTP_IDEMPOTENCY_KEY='retry-1')
+
+    def test_retry_replays_the_first_response_without_touching_the_database(self):
+        first = self.client.post('/flight/booking-application/', self.booking, format='json')
+        with self.assertNumQueries(0):
+            retry = self.client.post('/flight/booking-application/', self.booking, format='json')
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(BookingApplication.objects.count(), 1)
+
+    def test_retries_are_not_throttled(self):
+        statuses = [self.client.post('/flight/booking-application/', self.booking, format='json').status_code
+                    for _ in range(7)]
+        self.assertEqual(statuses, [201] * 7)
+        self.assertEqual(BookingApplication.objects.count(), 1)
+
+    def test_retry_after_cache_loss_is_answered_from_the_record(self):
+        first = self.client.post('/flight/booking-application/', self.booking, format='json')
+        cache.clear()
+        retry = self.client.post('/flight/booking-application/', self.booking, format='json')
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(BookingApplication.objects.count(), 1)
+
+    def test_key_reused_for_a_different_request_is_rejected(self):
+        self.client.post('/flight/booking-application/', self.booking, format='json')
+        response = self.client.post('/flight/booking-application/', {**self.booking, 'number_of_passengers': 3},
+                                    format='json')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(IdempotencyRecord.objects.count(), 1)
+
+
+class RetentionPolicyTests(TestCase):
+
+    def setUp(self):
+        long_ago = timezone.now() - datetime.timedelta(days=100)
+        for index in range(5):
+            ContactMessage.objects.create(full_name=f'Old {index}', email='ada@example.com', message='Hi',
+                                          is_hidden=True, date_hidden=long_ago)
+        self.recent = ContactMessage.objects.create(full_name='Recent', email='ada@example.com', message='Hi',
+                                                    is_hidden=True, date_hidden=timezone.now())
+        self.active = ContactMessage.objects.create(full_name='Active', email='ada@example.com', message='Hi')
+
+    def test_purge_deletes_expired_archived_rows_in_batches(self):
+        stats = apply_retention_policy('flights.ContactMessage', {'days': 90, 'action': 'purge'}, batch_size=2)
+        self.assertEqual((stats['purged'], stats['batches']), (5, 3))
+        self.assertEqual(set(ContactMessage.objects.values_list('pk', flat=True)), {self.recent.pk, self.active.pk})
+        self.assertFalse(ArchivedRecord.objects.exists())
+
+    def test_move_copies_rows_before_deleting_them(self):
+        stats = apply_retention_policy('flights.ContactMessage', {'days': 90, 'action': 'move'})
+        self.assertEqual(stats['moved'], 5)
+        self.assertEqual(ArchivedRecord.objects.filter(model_label='flights.ContactMessage').count(), 5)
+        self.assertEqual(ArchivedRecord.objects.first().data['full_name'], 'Old 0')
+        self.assertEqual(ContactMessage.objects.count(), 2)
+
+    def test_batches_continue_after_the_last_pk(self):
+        with CaptureQueriesContext(connection) as queries:
+            apply_retention_policy('flights.ContactMessage', {'days': 90, 'action': 'purge'}, batch_size=2)
+        selects = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertNotIn('"id" >', selects[0])
+        self.assertTrue(all('"id" >' in sql for sql in selects[1:]))
+
+    def test_dry_run_only_counts(self):
+        stats = apply_retention_policy('flights.ContactMessage', {'days': 90, 'action': 'purge'}, dry_run=True)
+        self.assertEqual(stats['matched'], 5)
+        self.assertEqual(ContactMessage.objects.count(), 7)
+
+    def test_models_with_cascading_relations_are_refused(self):
+        with self.assertRaises(ValueError):
+            apply_retention_policy('flights.FlightPackage', {'days': 90, 'action': 'purge'})
+
+
+class PartitionHelperTests(TestCase):
+
+    def test_add_months_rolls_over_years(self):
+        self.assertEqual(partitions.add_months(datetime.date(2024, 11, 1), 3), datetime.date(2025, 2, 1))
+        self.assertEqual(partitions.add_months(datetime.date(2024, 1, 1), -1), datetime.date(2023, 12, 1))
+
+    def test_partition_month_inverts_partition_name(self):
+        month = datetime.date(2025, 3, 1)
+        self.assertEqual(partitions.partition_month(partitions.partition_name(month)), month)
+        self.assertIsNone(partitions.partition_month(partitions.DEFAULT_PARTITION))
+        self.assertIsNone(partitions.partition_month('flights_flightpackage'))
+
+    def test_month_bounds_cover_exactly_one_month(self):
+        start, end = partitions.month_bounds(datetime.date(2024, 12, 1))
+        self.assertEqual((start.date(), end.date()), (datetime.date(2024, 12, 1), datetime.date(2025, 1, 1)))
+        self.assertEqual(start.utcoffset(), datetime.timedelta(0))
+
+    def test_parse_month(self):
+        self.assertEqual(partitions.parse_month('2025-02'), datetime.date(2025, 2, 1))
+        with self.assertRaises(ValueError):
+            partitions.parse_month('2025-13')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Booking partitioning is PostgreSQL only')
+class BookingPartitionTests(TestCase):
+
+    def test_migrations_partition_the_bookings_table(self):
+        self.assertTrue(partitions.is_partitioned(connection))
+        self.assertIn(partitions.DEFAULT_PARTITION, dict(partitions.list_partitions(connection)))
+
+    def test_new_month_partition_takes_over_rows_from_the_default_partition(self):
+        month = datetime.date(2090, 1, 1)
+        package = FlightPackage.objects.create(name='Paris', destination='Paris', origin='Lagos', price='450.00',
+                                               airline='Air France', departure_date=datetime.date(2090, 1, 5))
+        booking = BookingApplication.objects.create(
+            package=package, first_name='Ada', last_name='Obi', email='ada@example.com', number_of_passengers=1,
+            phone_number='08000000000', date_of_birth=datetime.date(1990, 1, 1), gender='f', nationality='Nigerian')
+        BookingApplication.objects.filter(pk=booking.pk).update(date_booked=partitions.month_bounds(month)[0])
+
+        self.assertTrue(partitions.create_month_partition(connection, month))
+        self.assertFalse(partitions.create_month_partition(connection, month))
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id FROM {quote(partitions.partition_name(month))}')
+            self.assertEqual(cursor.fetchall(), [(booking.pk,)])
+        self.assertTrue(BookingApplication.objects.filter(pk=booking.pk).exists())
+
+
+class BookingRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.paris = FlightPackage.objects.create(name='Paris', destination='Paris', origin='Lagos', price='450.00',
+                                                 airline='Air France', departure_date=datetime.date(2025, 3, 1))
+        cls.dubai = FlightPackage.objects.create(name='Dubai', destination='Dubai', origin='Lagos', price='650.00',
+                                                 airline='Emirates', departure_date=datetime.date(2025, 3, 1))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def book(self, package, passengers=2):
+        return BookingApplication.objects.create(
+            package=package, first_name='Ada', last_name='Obi', email='ada@example.com',
+            number_of_passengers=passengers, phone_number='08000000000', date_of_birth=datetime.date(1990, 1, 1),
+            gender='f', nationality='Nigerian')
+
+    def daily(self, package):
+        rollup = BookingRollup.objects.filter(granularity='day', package=package).first()
+        return (rollup.bookings, rollup.passengers) if rollup else (0, 0)
+
+    def test_create_update_archive_and_restore_keep_rollups_in_step(self):
+        booking = self.book(self.paris)
+        self.assertEqual(self.daily(self.paris), (1, 2))
+        self.assertEqual(BookingRollup.objects.get(granularity='week', package=self.paris).passengers, 2)
+
+        response = self.client.patch(f'/flight/booking-application/update/{booking.pk}/',
+                                     {'package': self.dubai.pk, 'number_of_passengers': 5}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.daily(self.paris), self.daily(self.dubai)), ((0, 0), (1, 5)))
+
+        self.client.delete(f'/flight/booking-application/archive/{booking.pk}/')
+        self.assertEqual((self.daily(self.paris), self.daily(self.dubai)), ((0, 0), (0, 0)))
+        self.client.patch(f'/flight/booking-application/archive/{booking.pk}/restore/')
+        self.assertEqual(self.daily(self.dubai), (1, 5))
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        self.book(self.paris)
+        self.book(self.paris, passengers=3)
+        BookingApplication.objects.create(
+            package=self.dubai, first_name='Ada', last_name='Obi', email='ada@example.com', number_of_passengers=1,
+            phone_number='08000000000', date_of_birth=datetime.date(1990, 1, 1), gender='f', nationality='Nigerian',
+            is_hidden=True)
+        incremental = set(BookingRollup.objects.filter(bookings__gt=0).values_list(
+            'granularity', 'period_start', 'package_id', 'bookings', 'passengers'))
+        call_command('rebuild_booking_rollups', stdout=StringIO())
+        self.assertEqual(set(BookingRollup.objects.values_list(
+            'granularity', 'period_start', 'package_id', 'bookings', 'passengers')), incremental)
+
+    def test_archiving_a_booking_without_a_rollup_writes_no_negative_totals(self):
+        booking = self.book(self.paris)
+        BookingRollup.objects.all().delete()
+        self.client.delete(f'/flight/booking-application/archive/{booking.pk}/')
+        self.assertFalse(BookingRollup.objects.exists())
+
+    def test_analytics_endpoint_reads_the_rollups(self):
+        self.book(self.paris)
+        self.book(self.dubai, passengers=4)
+        today = timezone.localdate().isoformat()
+        response = self.client.get('/flight/analytics/bookings/', {'group_by': 'destination'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted((str(row['period']), row['destination'], row['bookings'], row['passengers'])
+                                for row in response.data['results']),
+                         [(today, 'Dubai', 1, 4), (today, 'Paris', 1, 2)])
+        self.assertEqual(self.client.get('/flight/analytics/bookings/', {'start': '2025-02-01',
+                                                                         'end': '2025-01-01'}).status_code, 400)
+
+
+class PackageCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.paris = FlightPackage.objects.create(name='Paris', destination='Paris', origin='Lagos', price='450.00',
+                                                 airline='Air France', departure_date=datetime.date(2025, 3, 1))
+        cls.dubai = FlightPackage.objects.create(name='Dubai', destination='Dubai', origin='Lagos', price='650.00',
+                                                 airline='Emirates', departure_date=datetime.date(2025, 3, 1))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def book(self, package, passengers=2):
+        return BookingApplication.objects.create(
+            package=package, first_name='Ada', last_name='Obi', email='ada@example.com',
+            number_of_passengers=passengers, phone_number='08000000000', date_of_birth=datetime.date(1990, 1, 1),
+            gender='f', nationality='Nigerian')
+
+    def counters(self, package):
+        package.refresh_from_db()
+        return (package.total_bookings, package.total_passengers, package.recent_bookings, package.recent_passengers)
+
+    def test_counters_follow_create_update_archive_and_restore(self):
+        booking = self.book(self.paris)
+        self.assertEqual(self.counters(self.paris), (1, 2, 1, 2))
+        self.client.patch(f'/flight/booking-application/update/{booking.pk}/',
+                          {'package': self.dubai.pk, 'number_of_passengers': 5}, format='json')
+        self.assertEqual((self.counters(self.paris), self.counters(self.dubai)), ((0, 0, 0, 0), (1, 5, 1, 5)))
+        self.client.delete(f'/flight/booking-application/archive/{booking.pk}/')
+        self.assertEqual(self.counters(self.dubai), (0, 0, 0, 0))
+        self.client.patch(f'/flight/booking-application/archive/{booking.pk}/restore/')
+        self.assertEqual(self.counters(self.dubai), (1, 5, 1, 5))
+
+    def test_saving_a_loaded_package_keeps_counters_written_meanwhile(self):
+        self.book(self.paris)
+        package = FlightPackage.objects.get(pk=self.paris.pk)
+        self.book(self.paris)
+        package.price = '500.00'
+        package.save()
+        self.assertEqual(self.counters(self.paris), (2, 4, 2, 4))
+        self.assertEqual(self.paris.price, Decimal('500.00'))
+
+    def test_package_edit_archive_and_restore_keep_counters(self):
+        package = FlightPackage.objects.get(pk=self.paris.pk)
+        self.book(self.paris)
+        with mock.patch.object(FlightPackageCreateUpdateViewSet, 'get_object', return_value=package):
+            response = self.client.patch(f'/flight/package/{self.paris.pk}/', {'price': '500.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.delete(f'/flight/package/archive/{self.paris.pk}/').status_code, 200)
+        self.client.patch(f'/flight/package/archive/{self.paris.pk}/restore/')
+        self.assertEqual(self.counters(self.paris), (1, 2, 1, 2))
+
+    def test_reconcile_recomputes_counters_and_ages_out_recent_bookings(self):
+        old = self.book(self.paris, passengers=3)
+        BookingApplication.objects.filter(pk=old.pk).update(date_booked=timezone.now() - datetime.timedelta(days=30))
+        self.book(self.paris)
+        FlightPackage.objects.filter(pk=self.dubai.pk).update(total_bookings=7, recent_bookings=7)
+        self.assertEqual(reconcile_package_counters(batch_size=1), 2)
+        self.assertEqual(self.counters(self.paris), (2, 5, 1, 2))
+        self.assertEqual(self.counters(self.dubai), (0, 0, 0, 0))
+
+    def test_popular_ranks_recent_bookings_first(self):
+        self.book(self.dubai)
+        response = APIClient().get('/flight/packages/popular/')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.dubai.pk, self.paris.pk])
+        self.assertEqual(response.data['results'][0]['recent_bookings'], 1)
+
+
+class PackageBatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.packages = [FlightPackage.objects.create(name=f'Package {index}', destination='Paris', origin='Lagos',
+                                                     price='450.00', airline='Air France',
+                                                     departure_date=datetime.date(2025, 3, 1), is_hidden=index == 2)
+                        for index in range(3)]
+
+    def test_results_follow_requested_order_in_one_query(self):
+        first, second, archived = self.packages
+        ids = f'{second.pk},{first.pk},{second.pk},{archived.pk},999999'
+        with self.assertNumQueries(1):
+            response = APIClient().get('/flight/packages/batch/', {'ids': ids})
+        self.assertEqual([item and item['id'] for item in response.data['data']],
+                         [second.pk, first.pk, second.pk, None, None])
+        self.assertEqual(response.data['not_found'], [archived.pk, 999999])
+
+    def test_rejects_missing_malformed_and_oversized_id_lists(self):
+        client = APIClient()
+        self.assertEqual(client.get('/flight/packages/batch/').status_code, 400)
+        self.assertEqual(client.get('/flight/packages/batch/', {'ids': '1,x'}).status_code, 400)
+        ids = ','.join(str(pk) for pk in range(1, 52))
+        self.assertEqual(client.get('/flight/packages/batch/', {'ids': ids}).status_code, 400)
+
+
+class PackageFacetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for destination, airline in (('Paris', 'Air France'), ('Paris', 'Emirates'), ('Dubai', 'Emirates')):
+            FlightPackage.objects.create(name=destination, destination=destination, origin='Lagos', price='450.00',
+                                         airline=airline, departure_date=datetime.date(2025, 3, 1))
+
+    def test_counts_per_facet_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = APIClient().get('/flight/packages/facets/')
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['facets']['destination'],
+                         [{'value': 'Paris', 'count': 2}, {'value': 'Dubai', 'count': 1}])
+        self.assertEqual(response.data['facets']['airline'],
+                         [{'value': 'Emirates', 'count': 2}, {'value': 'Air France', 'count': 1}])
+        filtered = APIClient().get('/flight/packages/facets/', {'destination': 'dubai'})
+        self.assertEqual(filtered.data['facets']['airline'], [{'value': 'Emirates', 'count': 1}])
+
+    def test_cache_is_invalidated_once_a_package_change_commits(self):
+        client = APIClient()
+        client.get('/flight/packages/facets/', {'origin': 'lagos'})
+        version = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            FlightPackage.objects.create(name='Rome', destination='Rome', origin='Lagos', price='450.00',
+                                         airline='Emirates', departure_date=datetime.date(2025, 3, 1))
+            self.assertEqual(catalog_version(), version)
+        self.assertEqual(client.get('/flight/packages/facets/', {'origin': 'lagos'}).data['total'], 4)
+
+
+class PackageSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.packages = [
+            FlightPackage.objects.create(name=f'Paris {index}', destination='Paris', origin='Lagos',
+                                         price=f'{400 + 50 * index}.00', airline='Air France',
+                                         flight_class='business' if index % 2 else 'economy',
+                                         departure_date=datetime.date(2025, 3, 1) + datetime.timedelta(days=index))
+            for index in range(5)]
+
+    def ids(self, response):
+        return [item['id'] for item in response.data['results']]
+
+    def test_range_filters_and_ordering(self):
+        response = APIClient().get('/flight/packages/search/', {'min_price': '450', 'max_price': '550',
+                                                                'ordering': '-price'})
+        self.assertEqual(self.ids(response), [package.pk for package in self.packages[3:0:-1]])
+        response = APIClient().get('/flight/packages/search/', {'departure_from': '2025-03-04'})
+        self.assertEqual(self.ids(response), [self.packages[3].pk, self.packages[4].pk])
+
+    def test_invalid_ordering_and_ranges_are_rejected(self):
+        client = APIClient()
+        self.assertEqual(client.get('/flight/packages/search/', {'ordering': 'name'}).status_code, 400)
+        self.assertEqual(client.get('/flight/packages/search/', {'min_price': '-1'}).status_code, 400)
+        self.assertEqual(client.get('/flight/packages/search/', {'min_price': '600',
+                                                                 'max_price': '500'}).status_code, 400)
+
+    def test_cursor_pages_walk_the_whole_result_set(self):
+        client = APIClient()
+        response = client.get('/flight/packages/search/', {'ordering': 'price', 'page_size': 2})
+        seen = self.ids(response)
+        while response.data['next']:
+            response = client.get(response.data['next'])
+            seen += self.ids(response)
+        self.assertEqual(seen, [package.pk for package in self.packages])
+
+    def test_unindexable_filters_are_rejected_with_keyset_parameters(self):
+        client = APIClient()
+        self.assertEqual(client.get('/flight/packages/search/', {'destination': 'aris',
+                                                                 'ordering': 'price'}).status_code, 400)
+        self.assertEqual(client.get('/flight/packages/search/', {'flight_class': 'busi',
+                                                                 'ordering': 'price'}).status_code, 400)
+        response = client.get('/flight/packages/search/', {'flight_class': 'business', 'ordering': 'price'})
+        self.assertEqual(self.ids(response), [self.packages[1].pk, self.packages[3].pk])
+
+    def test_plain_list_is_capped(self):
+        with mock.patch('flights.views.NotAdminFlightPackageAdditionalViewSet.search_max_results', 3):
+            response = APIClient().get('/flight/packages/search/', {'destination': 'aris'})
+        self.assertEqual([item['id'] for item in response.data], [package.pk for package in self.packages[:3]])
+
+
+class FareCalendarTests(TestCase):
+
+    def package(self, origin, price, **extra):
+        return FlightPackage.objects.create(name='Paris', destination='Paris', origin=origin, price=price,
+                                            airline='Air France', departure_date=datetime.date(2025, 3, 1), **extra)
+
+    def test_lowest_fare_follows_package_changes(self):
+        cheap = self.package('Lagos\t', '400.00')
+        self.package(' lagos', '450.00')
+        response = APIClient().get('/flight/fare-calendar/', {'origin': 'LAGOS', 'destination': 'paris',
+                                                              'month': '2025-03'})
+        self.assertEqual(response.data['days'], [{'date': '2025-03-01', 'min_price': '400.00',
+                                                  'package_id': cheap.pk, 'package_count': 2}])
+        cheap.price = '500.00'
+        cheap.save()
+        day = FareCalendarDay.objects.get()
+        self.assertEqual((str(day.min_price), day.package_count), ('450.00', 2))
+
+    def test_every_spelling_and_code_of_an_airport_shares_one_calendar(self):
+        load_airport('LOS', 'Murtala Muhammed International Airport', 'Lagos', 'Nigeria')
+        cheap = self.package('Lagos (LOS)', '400.00')
+        self.package('lagos', '450.00')
+        for origin in ('LOS', 'Lagos', 'lagos (los)'):
+            response = APIClient().get('/flight/fare-calendar/', {'origin': origin, 'destination': 'Paris',
+                                                                  'month': '2025-03'})
+            self.assertEqual(response.data['days'], [{'date': '2025-03-01', 'min_price': '400.00',
+                                                      'package_id': cheap.pk, 'package_count': 2}])
+        response = APIClient().get('/flight/fare-calendar/', {'origin': 'Nowhere', 'destination': 'Paris',
+                                                              'month': '2025-03'})
+        self.assertEqual(response.data['days'], [])
+        self.assertFalse(Airport.objects.filter(city='Nowhere').exists())
+
+    def test_merging_airports_moves_their_fares(self):
+        self.package('Lagos', '400.00')
+        self.package('Ikeja', '300.00')
+        load_airport('LOS', 'Murtala Muhammed International Airport', 'Lagos', 'Nigeria', ['ikeja'])
+        day = FareCalendarDay.objects.get()
+        self.assertEqual((day.origin_airport.iata_code, str(day.min_price), day.package_count), ('LOS', '300.00', 2))
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        self.package('Lagos', '400.00')
+        self.package('Abuja', '300.00')
+        self.package('Lagos', '350.00', is_hidden=True)
+        fields = ('origin_airport', 'destination_airport', 'day', 'min_price', 'package_id', 'package_count')
+        incremental = set(FareCalendarDay.objects.values_list(*fields))
+        call_command('rebuild_fare_calendar', stdout=StringIO())
+        self.assertEqual(set(FareCalendarDay.objects.values_list(*fields)), incremental)
+
+
+class ReferenceDataTests(TestCase):
+
+    def package(self, origin):
+        return FlightPackage.objects.create(name='Paris', destination='Paris', origin=origin, price='450.00',
+                                            airline='Air France', departure_date=datetime.date(2025, 3, 1))
+
+    def test_resolution_by_alias_code_and_code_suffix(self):
+        load_airport('LOS', 'Murtala Muhammed International Airport', 'Lagos', 'Nigeria', ['ikeja'])
+        lagos = Airport.objects.get(iata_code='LOS')
+        self.assertEqual({resolve_airport(value) for value in ('Lagos', ' IKEJA ', 'los', 'Lagos (LOS)')},
+                         {lagos.pk})
+        self.assertTrue(AirportAlias.objects.filter(alias='lagos (los)', airport=lagos).exists())
+        self.assertNotEqual(resolve_airport('Lagoss'), lagos.pk)
+
+    def test_loader_folds_auto_created_spellings_into_the_coded_airport(self):
+        first, second = self.package('Lagos'), self.package('Ikeja')
+        self.assertNotEqual(first.origin_airport_id, second.origin_airport_id)
+        call_command('load_reference_data', stdout=StringIO())
+        lagos = Airport.objects.get(iata_code='LOS')
+        self.assertEqual(set(FlightPackage.objects.values_list('origin_airport_id', flat=True)), {lagos.pk})
+        self.assertEqual(Airport.objects.filter(iata_code__isnull=True, city__in=['Lagos', 'Ikeja']).count(), 0)
+
+        response = APIClient().get('/flight/packages/search/', {'origin': 'ikeja', 'ordering': 'price'})
+        self.assertEqual([item['id'] for item in response.data['results']], [first.pk, second.pk])
+
+    def test_merge_command_combines_spellings(self):
+        first, second = self.package('Lagos Island'), self.package('Lasgidi')
+        self.assertNotEqual(first.origin_airport_id, second.origin_airport_id)
+        call_command('merge_reference_aliases', 'airport', 'lagos island', 'lasgidi', stdout=StringIO())
+        self.assertEqual(set(FlightPackage.objects.values_list('origin_airport_id', flat=True)),
+                         {first.origin_airport_id})
+        self.assertEqual(resolve_airport('Lasgidi'), first.origin_airport_id)
+
+
+class SuggestIndexTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for origin, destination in (('Lagos', 'New York'), ('Lagos', 'Newark'), ('Abuja', 'New York')):
+            FlightPackage.objects.create(name=destination, destination=destination, origin=origin, price='450.00',
+                                         airline='Air France', departure_date=datetime.date(2025, 3, 1))
+        suggest_index.build()
+
+    def package(self, destination):
+        return FlightPackage.objects.create(name=destination, destination=destination, origin='Lagos',
+                                            price='450.00', airline='Air France',
+                                            departure_date=datetime.date(2025, 3, 1))
+
+    def values(self, prefix, kind='destination'):
+        return [(item['value'], item['count']) for item in suggest_index.suggest(prefix, kind=kind)]
+
+    def test_completions_are_ranked_by_package_count_and_match_word_starts(self):
+        self.assertEqual(self.values('new'), [('New York', 2), ('Newark', 1)])
+        self.assertEqual(self.values('york'), [('New York', 2)])
+        response = APIClient().get('/flight/packages/suggest/', {'q': 'la'})
+        self.assertEqual(response.data['results'], [{'value': 'Lagos', 'kind': 'origin', 'count': 2}])
+        self.assertEqual(APIClient().get('/flight/packages/suggest/', {'q': 'la', 'kind': 'x'}).status_code, 400)
+
+    def test_committed_changes_patch_the_index_without_a_rebuild(self):
+        with mock.patch.object(suggest_index, 'build') as build:
+            with self.captureOnCommitCallbacks(execute=True):
+                package = self.package('Newcastle')
+                self.assertEqual(self.values('newc'), [])
+            self.assertEqual(self.values('newc'), [('Newcastle', 1)])
+            with self.captureOnCommitCallbacks(execute=True):
+                package.delete()
+            self.assertEqual(self.values('newc'), [])
+        build.assert_not_called()
+        self.assertEqual(suggest_index.version, catalog_version())
+
+    def test_rolled_back_changes_do_not_reach_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.package('Newcastle')
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        self.assertEqual(self.values('newc'), [])
 
-# Create your tests here.
+    def test_warm_up_survives_an_unavailable_cache(self):
+        with mock.patch('flights.suggest.catalog_version', side_effect=ConnectionError), \
+                self.assertLogs('flights.suggest', 'WARNING'):
+            warm_suggest_index()
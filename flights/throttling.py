@@ -0,0 +1,80 @@
+"""
+Rate limiting for the unauthenticated write and login endpoints.
+
+DRF's rate throttles keep a log of request timestamps per key in the default cache (Redis in production, so the
+limits are shared between workers) and count the ones inside the window, i.e. a sliding window. Views set a
+`throttle_scope` and rates are configured per scope in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']: `<scope>` per
+client IP and `<scope>_account` per account, the request body field named by the view's `throttle_account_field`.
+"""
+import hashlib
+
+from rest_framework.throttling import ScopedRateThrottle, SimpleRateThrottle
+
+
+def account_ident(request, view):
+    """Hashed, normalized account (e.g. username or email) the request is for, or None."""
+    field = getattr(view, 'throttle_account_field', None)
+    if not field:
+        return None
+    value = request.data.get(field) if hasattr(request.data, 'get') else None
+    value = str(value or '').strip().lower()
+    if not value:
+        return None
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+class ScopedAccountRateThrottle(ScopedRateThrottle):
+    """Limits requests for the same account, whatever IP they come from, at the `<throttle_scope>_account` rate."""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope or not getattr(view, 'throttle_account_field', None):
+            return True
+        self.scope = f'{scope}_account'
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return SimpleRateThrottle.allow_request(self, request, view)
+
+    def get_cache_key(self, request, view):
+        ident = account_ident(request, view)
+        if ident is None:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class LoginLockoutThrottle(SimpleRateThrottle):
+    """Refuses logins for an IP or username with too many recent failures, before any password is hashed.
+
+    Only failed attempts are recorded (by the view, through `record_failure`), at the `login_failures` rate.
+    """
+    scope = 'login_failures'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+    def get_cache_keys(self, request, view):
+        keys = [self.get_cache_key(request, view)]
+        ident = account_ident(request, view)
+        if ident is not None:
+            keys.append(self.cache_format % {'scope': f'{self.scope}_account', 'ident': ident})
+        return keys
+
+    def recent_failures(self, key):
+        return [moment for moment in self.cache.get(key, []) if moment > self.now - self.duration]
+
+    def allow_request(self, request, view):
+        self.now = self.timer()
+        for key in self.get_cache_keys(request, view):
+            self.history = self.recent_failures(key)
+            if len(self.history) >= self.num_requests:
+                return False
+        return True
+
+    def record_failure(self, request, view):
+        self.now = self.timer()
+        for key in self.get_cache_keys(request, view):
+            self.cache.set(key, [self.now] + self.recent_failures(key), self.duration)
+
+    def reset_account(self, request, view):
+        # Only the account key: a valid login must not clear the failures an IP racked up on other accounts.
+        self.cache.delete_many(self.get_cache_keys(request, view)[1:])
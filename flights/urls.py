@@ -25,6 +25,9 @@ from .views import BookingApplicationCreateViewSet, AdminBookingApplicationAddit
 from .views import ContactMessageCreateViewSet, AdminContactMessageAdditionalViewSet, \
     ContactMessageListRetrieveViewSet, ContactMessageUpdateViewSet, ContactMessageArchiveRestoreListDetailViewSet
 
+# for fare calendar and analytics
+from .views import FareCalendarViewSet, BookingAnalyticsViewSet
+
 router = DefaultRouter()
 # for FlightPackage
 router.register(r'flight/package/list', FlightPackageReadViewSet, basename='r_package')
@@ -50,6 +53,12 @@ router.register(r'flight/contact-message/update', ContactMessageUpdateViewSet, b
 router.register(r'flight/contact-message/archive', ContactMessageArchiveRestoreListDetailViewSet,
                 basename='arld_message')
 
+# for fare calendar
+router.register(r'flight/fare-calendar', FareCalendarViewSet, basename='fare_calendar')
+
+# for analytics
+router.register(r'flight/analytics', BookingAnalyticsViewSet, basename='analytics')
+
 urlpatterns = [
                   path('admin/register', AdminRegisterView.as_view(), name='admin_register'),
                   path('admin/login/', AdminLoginView.as_view(), name='admin_login'),
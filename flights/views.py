@@ -1,23 +1,45 @@
 import datetime
+import hashlib
 
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Value
 from django.utils import timezone
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet, ReadOnlyModelViewSet
 from rest_framework.response import Response
 from rest_framework import status, mixins
+from rest_framework.serializers import Serializer
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework_simplejwt.tokens import RefreshToken
-from drf_spectacular.utils import extend_schema, OpenApiParameter
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
 
 from django.contrib.auth import authenticate
-from .models import FlightPackage, BookingApplication, ContactMessage
+from .models import FlightPackage, BookingApplication, ContactMessage, FareCalendarDay, IdempotencyRecord
 from .serializers import (FlightPackageSerializer, UserSerializer, AdminLoginSerializer, AdminUpdatePasswordSerializer,
-                          BookingApplicationSerializer, ContactMessageSerializer)
+                          BookingApplicationSerializer, ContactMessageSerializer, BookingAnalyticsQuerySerializer,
+                          PopularFlightPackageSerializer, ExpandedBookingApplicationSerializer,
+                          ContactMessageListSerializer, PackageSearchQuerySerializer, FareCalendarQuerySerializer,
+                          FareCalendarDaySerializer)
+from .pagination import PopularPackagePagination, PackageSearchPagination
+from .signals import archived, restored
+from .analytics import booking_series
+from .catalog import catalog_cache_key
+from . import idempotency
+from .reference import find_airport, matching_airline_ids, matching_airport_ids
+from .suggest import KINDS as SUGGEST_KINDS, suggest_index
+from .throttling import LoginLockoutThrottle, ScopedAccountRateThrottle
 
 
 class AdminRegisterView(APIView):
     serializer_class = UserSerializer
+    throttle_classes = [ScopedRateThrottle, ScopedAccountRateThrottle]
+    throttle_scope = 'register'
+    throttle_account_field = 'username'
 
     def post(self, request):
         serializer = UserSerializer(data=request.data)
@@ -29,6 +51,9 @@ class AdminRegisterView(APIView):
 
 class AdminLoginView(APIView):
     serializer_class = AdminLoginSerializer
+    throttle_classes = [LoginLockoutThrottle, ScopedRateThrottle, ScopedAccountRateThrottle]
+    throttle_scope = 'login'
+    throttle_account_field = 'username'
 
     def post(self, request):
         serializer = AdminLoginSerializer(data=request.data)
@@ -37,12 +62,14 @@ class AdminLoginView(APIView):
             password = serializer.validated_data['password']
             user = authenticate(request, username=username, password=password, is_staff=True)
             if user is not None:
+                LoginLockoutThrottle().reset_account(request, self)
                 refresh = RefreshToken.for_user(user)
                 return Response({
                     "access_token": str(refresh.access_token),
                     "refresh_token": str(refresh),
                     "message": "Admin authenticated and logged in successfully"
                 }, status=status.HTTP_200_OK)
+            LoginLockoutThrottle().record_failure(request, self)
             return Response({"detail": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -68,13 +95,92 @@ class AdminUpdatePasswordView(APIView):
             return Response({'error': 'Invalid old password'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ArchiveRestoreListDetailViewSet(mixins.DestroyModelMixin, GenericViewSet):
+def serializer_columns(serializer, names):
+    """Return the `.only()` columns and `select_related()` relations needed to serialize `names`.
+
+    Returns None when a field is not backed by a concrete model field, in which case nothing can be pruned.
+    """
+    model = serializer.Meta.model
+    columns, relations = [model._meta.pk.name], []
+    for name in names:
+        field = serializer.fields[name]
+        try:
+            model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        columns.append(field.source)
+        if isinstance(field, Serializer):
+            nested = serializer_columns(field, list(field.fields))
+            if nested is None:
+                return None
+            nested_columns, nested_relations = nested
+            columns += [f'{field.source}__{column}' for column in nested_columns]
+            relations += [field.source] + [f'{field.source}__{relation}' for relation in nested_relations]
+    return columns, relations
+
+
+def prune_queryset(queryset, serializer, names):
+    plan = serializer_columns(serializer, names)
+    if plan is None:
+        return queryset
+    columns, relations = plan
+    queryset = queryset.select_related(None)
+    if relations:
+        queryset = queryset.select_related(*relations)
+    return queryset.only(*columns)
+
+
+class SparseFieldsetMixin:
+    """Let read endpoints return a subset of fields with `?fields=a,b` or `?omit=c,d`.
+
+    The names are validated against the serializer's declared fields, and the selection is pushed down to the
+    query with `.only()` so unused columns are not loaded either.
+    """
+
+    def get_sparse_fieldset(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method != 'GET':
+            return None
+        fields = [name.strip() for name in request.query_params.get('fields', '').split(',') if name.strip()]
+        omit = [name.strip() for name in request.query_params.get('omit', '').split(',') if name.strip()]
+        if not fields and not omit:
+            return None
+        declared = list(self.get_serializer_class()().fields)
+        unknown = [name for name in fields + omit if name not in declared]
+        if unknown:
+            raise ValidationError({'fields': f"Unknown field(s): {', '.join(unknown)}. "
+                                             f"Available fields: {', '.join(declared)}"})
+        return [name for name in declared if (not fields or name in fields) and name not in omit]
+
+    def get_sparse_context(self):
+        return {'sparse_fields': self.get_sparse_fieldset()}
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), **self.get_sparse_context()}
+
+    def prune_full_fieldset(self):
+        """Whether to prune columns to the serializer's fields even without `?fields=`/`?omit=`."""
+        return False
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        selected = self.get_sparse_fieldset()
+        if selected is None and not self.prune_full_fieldset():
+            return queryset
+        serializer = self.get_serializer_class()()
+        return prune_queryset(queryset, serializer, selected if selected is not None else list(serializer.fields))
+
+
+class ArchiveRestoreListDetailViewSet(SparseFieldsetMixin, mixins.DestroyModelMixin, GenericViewSet):
 
     def destroy(self, request, pk=None, *args, **kwargs):
         try:
             instance = self.queryset.get(pk=pk, is_hidden=False)
             instance.is_hidden = True
-            instance.save()
+            instance.date_hidden = timezone.now()
+            with transaction.atomic():
+                instance.save()
+                archived.send(sender=self.queryset.model, instance=instance)
             return Response({'message': 'Successfully Archived'}, status=status.HTTP_200_OK)
         except self.queryset.model.DoesNotExist:
             return Response({'error': 'Object not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -87,11 +193,11 @@ class ArchiveRestoreListDetailViewSet(mixins.DestroyModelMixin, GenericViewSet):
     )
     @action(detail=False, methods=['get'])
     def archived_list(self, request, *args, **kwargs):
-        queryset = self.queryset.filter(is_hidden=True)
+        queryset = self.get_queryset().filter(is_hidden=True)
         try:
             if queryset:
                 archived_count = queryset.count()
-                serializer = self.serializer_class(queryset, many=True)
+                serializer = self.get_serializer_class()(queryset, many=True, context=self.get_sparse_context())
                 return Response(
                     {'archived_count': archived_count, 'message': 'List of Successfully Retrieved Archived Models',
                      'data': serializer.data})
@@ -108,11 +214,11 @@ class ArchiveRestoreListDetailViewSet(mixins.DestroyModelMixin, GenericViewSet):
     )
     @action(detail=True, methods=['get'])
     def archived_retrieve(self, request, pk=None, *args, **kwargs):
-        queryset = self.queryset.filter(is_hidden=True)
+        queryset = self.get_queryset().filter(is_hidden=True)
         queryset = queryset.filter(pk=pk)
         try:
             if queryset:
-                serializer = self.serializer_class(queryset.first())
+                serializer = self.get_serializer_class()(queryset.first(), context=self.get_sparse_context())
                 return Response({'message': 'Successfully Retrieved Archived Models', 'data': serializer.data})
             return Response({'error': 'Object not found'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -130,7 +236,10 @@ class ArchiveRestoreListDetailViewSet(mixins.DestroyModelMixin, GenericViewSet):
         try:
             instance = self.queryset.get(pk=pk, is_hidden=True)
             instance.is_hidden = False
-            instance.save()
+            instance.date_hidden = None
+            with transaction.atomic():
+                instance.save()
+                restored.send(sender=self.queryset.model, instance=instance)
             return Response({'message': 'Successfully Restored'}, status=status.HTTP_200_OK)
         except self.queryset.model.DoesNotExist:
             return Response({'error': 'Object not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -138,50 +247,200 @@ class ArchiveRestoreListDetailViewSet(mixins.DestroyModelMixin, GenericViewSet):
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class ExpandPackageMixin(SparseFieldsetMixin):
+    """Embed the booked package with `?expand=package`, loaded in the same query through a join."""
+    expanded_serializer_class = ExpandedBookingApplicationSerializer
+
+    def expand_package(self):
+        request = getattr(self, 'request', None)
+        return request is not None and 'package' in request.query_params.get('expand', '').split(',')
+
+    def get_serializer_class(self):
+        if self.expand_package():
+            return self.expanded_serializer_class
+        return super().get_serializer_class()
+
+    def prune_full_fieldset(self):
+        return self.expand_package()
+
+
+SEARCH_PARAMETERS = [
+    OpenApiParameter(name='destination', type=str, required=False, description="Search by destination"),
+    OpenApiParameter(name='origin', type=str, required=False, description="Search by origin"),
+    OpenApiParameter(name='flight_mode', type=str, required=False, description="Search by flight mode"),
+    OpenApiParameter(name='flight_class', type=str, required=False, description="Search by flight class"),
+    OpenApiParameter(name='airline', type=str, required=False, description="Search by airline"),
+    OpenApiParameter(name='departure_date', type=str, required=False, description="Search by departure date"),
+    OpenApiParameter(name='return_date', type=str, required=False, description="Search by return date"),
+    OpenApiParameter(name='min_price', type=float, required=False, description="Minimum price"),
+    OpenApiParameter(name='max_price', type=float, required=False, description="Maximum price"),
+    OpenApiParameter(name='departure_from', type=str, required=False, description="Earliest departure date"),
+    OpenApiParameter(name='departure_to', type=str, required=False, description="Latest departure date"),
+    OpenApiParameter(name='return_from', type=str, required=False, description="Earliest return date"),
+    OpenApiParameter(name='return_to', type=str, required=False, description="Latest return date"),
+]
+
+
 # for anonymous users
-class FlightPackageReadViewSet(ReadOnlyModelViewSet):
+class FlightPackageReadViewSet(SparseFieldsetMixin, ReadOnlyModelViewSet):
     serializer_class = FlightPackageSerializer
     queryset = FlightPackage.objects.filter(is_hidden=False)
     permission_classes = [AllowAny]
 
+    @extend_schema(
+        responses=FlightPackageSerializer(many=True),
+        description="Active packages similar to this one (same route, nearby dates, similar price and class), "
+                    "best match first. Precomputed, see the compute_similar_packages command."
+    )
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        queryset = self.get_queryset().filter(recommended_for__package_id=pk).order_by('recommended_for__rank')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
 
-class NotAdminFlightPackageAdditionalViewSet(GenericViewSet):
+class NotAdminFlightPackageAdditionalViewSet(SparseFieldsetMixin, GenericViewSet):
     serializer_class = FlightPackageSerializer
     queryset = FlightPackage.objects.filter(is_hidden=False)
     permission_classes = [AllowAny]
+    popular_cache_timeout = 60
+    batch_max_size = 50
+    facet_fields = ['airline', 'destination', 'origin', 'flight_class', 'flight_mode']
+    facets_cache_timeout = 60 * 60 * 24
+    suggest_max_limit = 20
+    # Plain-list searches (no ordering, cursor, page_size or range filter) return at most this many packages.
+    search_max_results = 100
+
+    keyset_params = ('ordering', 'cursor', 'page_size', *PackageSearchQuerySerializer.RANGE_FILTERS)
+
+    def search_filters(self, query_params, indexed_only=False):
+        """Filters for the search parameters in `query_params`.
+
+        With `indexed_only`, lookups that cannot use an index are rejected instead of falling back to `icontains`:
+        flight mode and class must be exact choices and places and airlines must match a known alias or code.
+        """
+        query = PackageSearchQuerySerializer(data=query_params)
+        query.is_valid(raise_exception=True)
+        filters = {
+            'departure_date': query_params.get('departure_date'),
+            'return_date': query_params.get('return_date'),
+        }
+        for param in ('flight_mode', 'flight_class'):
+            value = query_params.get(param)
+            if value and indexed_only:
+                choices = [choice for choice, _ in FlightPackage._meta.get_field(param).choices]
+                if value not in choices:
+                    raise ValidationError({param: f"Must be one of {', '.join(choices)} when results are ordered, "
+                                                  f"paginated or range filtered."})
+                filters[param] = value
+            elif value:
+                filters[f'{param}__icontains'] = value
+        filters = {k: v for k, v in filters.items() if v}
+        # Places and airlines resolve through the alias index; free text that matches no alias falls back to icontains.
+        for param, reference_field, lookup in (('origin', 'origin_airport', matching_airport_ids),
+                                               ('destination', 'destination_airport', matching_airport_ids),
+                                               ('airline', 'airline_ref', matching_airline_ids)):
+            text = query_params.get(param)
+            if text:
+                ids = lookup(text)
+                if not ids and indexed_only:
+                    raise ValidationError({param: "No known match; free-text matching is not available when results "
+                                                  "are ordered, paginated or range filtered."})
+                filters.update({f'{reference_field}__in': sorted(ids)} if ids else {f'{param}__icontains': text})
+        filters.update(query.range_filters())
+        return filters
+
+    def get_serializer_class(self):
+        if self.action == 'popular':
+            return PopularFlightPackageSerializer
+        return super().get_serializer_class()
 
     @extend_schema(
         responses=FlightPackageSerializer(many=True),
-        parameters=[
-            OpenApiParameter(name='destination', type=str, required=False, description="Search by destination"),
-            OpenApiParameter(name='origin', type=str, required=False, description="Search by origin"),
-            OpenApiParameter(name='flight_mode', type=str, required=False, description="Search by flight mode"),
-            OpenApiParameter(name='flight_class', type=str, required=False, description="Search by flight class"),
-            OpenApiParameter(name='airline', type=str, required=False, description="Search by airline"),
-            OpenApiParameter(name='departure_date', type=str, required=False,
-                             description="Search by departure date"),
-            OpenApiParameter(name='return_date', type=str, required=False, description="Search by return date"),
+        parameters=SEARCH_PARAMETERS + [
+            OpenApiParameter(name='ordering', type=str, required=False,
+                             enum=list(PackageSearchQuerySerializer.ORDERINGS),
+                             description="Sort order, defaults to departure_date when results are paginated"),
+            OpenApiParameter(name='cursor', type=str, required=False, description="Cursor of the page to fetch"),
+            OpenApiParameter(name='page_size', type=int, required=False, description="Results per page (max 100)"),
         ],
-        description="Search for flight packages by various fields."
+        description="Search for flight packages by various fields. Using ordering, cursor, page_size or any range "
+                    "filter returns keyset-paginated results ({next, previous, results}) and requires exact flight "
+                    "mode and class values and known places and airlines. Otherwise a plain list of at most 100 "
+                    "packages is returned, soonest departure first."
     )
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], pagination_class=PackageSearchPagination)
     def search(self, request, *args, **kwargs):
-        filters = {
-            'destination__icontains': request.query_params.get('destination'),
-            'origin__icontains': request.query_params.get('origin'),
-            'flight_mode__icontains': request.query_params.get('flight_mode'),
-            'flight_class__icontains': request.query_params.get('flight_class'),
-            'airline__icontains': request.query_params.get('airline'),
-            'departure_date': request.query_params.get('departure_date'),
-            'return_date': request.query_params.get('return_date'),
-        }
-        filters = {k: v for k, v in filters.items() if v}
-        if filters:
-            packages = self.queryset.filter(is_hidden=False).filter(**filters)
-            serializer = self.serializer_class(packages, many=True)
+        keyset = any(param in request.query_params for param in self.keyset_params)
+        filters = self.search_filters(request.query_params, indexed_only=keyset)
+        if filters or keyset:
+            packages = self.get_queryset().filter(is_hidden=False).filter(**filters)
+            if keyset:
+                self.search_ordering = PackageSearchQuerySerializer.ORDERINGS[
+                    request.query_params.get('ordering', 'departure_date')]
+                page = self.paginate_queryset(packages)
+                serializer = self.serializer_class(page, many=True, context=self.get_sparse_context())
+                return self.get_paginated_response(serializer.data)
+            packages = packages.order_by(*PackageSearchQuerySerializer.ORDERINGS['departure_date'])
+            serializer = self.serializer_class(packages[:self.search_max_results], many=True,
+                                               context=self.get_sparse_context())
             return Response(serializer.data)
         return Response({'error': 'A query parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        responses={'200': None},
+        parameters=SEARCH_PARAMETERS,
+        description="Counts per airline, destination, origin, flight class and flight mode for the packages matching "
+                    "the same filters as search. Cached until the catalog next changes."
+    )
+    @action(detail=False, methods=['get'])
+    def facets(self, request, *args, **kwargs):
+        filters = self.search_filters(request.query_params)
+        cache_key = catalog_cache_key('package_facets', hashlib.md5(repr(sorted(filters.items())).encode()).hexdigest())
+        data = cache.get(cache_key)
+        if data is None:
+            # One GROUP BY per facet, sent as a single UNION ALL: one row per distinct value and facet rather
+            # than per combination of values.
+            packages = FlightPackage.objects.filter(is_hidden=False).filter(**filters)
+            per_facet = [packages.values(field).annotate(facet=Value(field), count=Count('id'))
+                         .values_list('facet', field, 'count').order_by() for field in self.facet_fields]
+            facets = {field: {} for field in self.facet_fields}
+            for field, value, count in per_facet[0].union(*per_facet[1:], all=True):
+                facets[field][value] = count
+            data = {
+                'total': sum(facets[self.facet_fields[0]].values()),
+                'facets': {
+                    field: [{'value': value, 'count': count}
+                            for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+                    for field, counts in facets.items()
+                },
+            }
+            cache.set(cache_key, data, self.facets_cache_timeout)
+        return Response(data)
+
+    @extend_schema(
+        responses={'200': None},
+        parameters=[
+            OpenApiParameter(name='q', type=str, required=True, description="Text typed so far"),
+            OpenApiParameter(name='kind', type=str, required=False, enum=list(SUGGEST_KINDS),
+                             description="Only suggest origins, destinations or airlines"),
+            OpenApiParameter(name='limit', type=int, required=False, description="Maximum completions (max 20)"),
+        ],
+        description="Autocomplete origins, destinations and airlines of active packages from an in-memory index."
+    )
+    @action(detail=False, methods=['get'])
+    def suggest(self, request, *args, **kwargs):
+        prefix = request.query_params.get('q', '')
+        kind = request.query_params.get('kind') or None
+        if kind is not None and kind not in SUGGEST_KINDS:
+            return Response({'error': f"kind must be one of {', '.join(SUGGEST_KINDS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), self.suggest_max_limit)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'query': prefix, 'results': suggest_index.suggest(prefix, kind=kind, limit=max(limit, 1))})
+
     @extend_schema(
         responses={'200': None},
         description="Get the total count of active flight packages and the count of recent ones."
@@ -195,6 +454,56 @@ class NotAdminFlightPackageAdditionalViewSet(GenericViewSet):
         return Response(
             {'total_active_count': total_active_count, 'recent_count': recent_count})
 
+    @extend_schema(
+        responses=PopularFlightPackageSerializer(many=True),
+        parameters=[
+            OpenApiParameter(name='page', type=int, required=False, description="Page number"),
+            OpenApiParameter(name='page_size', type=int, required=False, description="Results per page (max 50)"),
+        ],
+        description="Active flight packages ranked by bookings in the last 7 days, then by all-time bookings."
+    )
+    @action(detail=False, methods=['get'], pagination_class=PopularPackagePagination)
+    def popular(self, request, *args, **kwargs):
+        cache_key = f'popular_packages:{hashlib.md5(request.get_full_path().encode()).hexdigest()}'
+        data = cache.get(cache_key)
+        if data is None:
+            queryset = self.get_queryset().order_by('-recent_bookings', '-total_bookings', '-id')
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            data = self.get_paginated_response(serializer.data).data
+            cache.set(cache_key, data, self.popular_cache_timeout)
+        return Response(data)
+
+    @extend_schema(
+        responses={'200': None},
+        parameters=[
+            OpenApiParameter(name='ids', type=str, required=True,
+                             description="Comma-separated package ids, e.g. 4,12,7 (max 50)"),
+        ],
+        description="Retrieve several active flight packages in one request. Results follow the order of `ids`; "
+                    "ids that do not match an active package are returned as null and listed in `not_found`."
+    )
+    @action(detail=False, methods=['get'])
+    def batch(self, request, *args, **kwargs):
+        raw_ids = [value.strip() for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        if not raw_ids:
+            return Response({'error': 'The ids query parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(raw_ids) > self.batch_max_size:
+            return Response({'error': f'At most {self.batch_max_size} ids can be requested at once'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(value) for value in raw_ids]
+        except ValueError:
+            return Response({'error': 'ids must be a comma-separated list of integers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        packages = {package.pk: package for package in self.get_queryset().filter(id__in=set(ids))}
+        serialized = {pk: data for pk, data in zip(packages, self.get_serializer(packages.values(), many=True).data)}
+        return Response({
+            'data': [serialized.get(pk) for pk in ids],
+            'not_found': [pk for pk in dict.fromkeys(ids) if pk not in packages],
+        })
+
 
 # for admin users
 class FlightPackageCreateUpdateViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin,
@@ -210,10 +519,68 @@ class FlightPackageArchiveRestoreListDetailViewSet(ArchiveRestoreListDetailViewS
     permission_classes = [IsAuthenticated]
 
 
-class BookingApplicationCreateViewSet(mixins.CreateModelMixin, GenericViewSet):
+class IdempotentCreateMixin:
+    """Honour an `Idempotency-Key` header on create: a retried request replays the first response instead of
+    creating a duplicate. Reusing a key for a different request body is rejected with 422.
+    """
+    idempotency_scope = None
+
+    def idempotency_lookup(self, request):
+        """(record key, request fingerprint, stored outcome or None) for a well-formed key header, else None."""
+        if not hasattr(self, '_idempotency_lookup'):
+            self._idempotency_lookup = None
+            key = (request.headers.get(idempotency.HEADER) or '').strip()
+            if key and len(key) <= idempotency.MAX_KEY_LENGTH:
+                key = idempotency.record_key(self.idempotency_scope, key)
+                self._idempotency_lookup = (key, idempotency.request_fingerprint(request),
+                                            idempotency.stored_outcome(key))
+        return self._idempotency_lookup
+
+    def check_throttles(self, request):
+        # A replay creates nothing, so a retrying client must get its stored response rather than a 429.
+        lookup = self.idempotency_lookup(request) if self.action == 'create' else None
+        if lookup is not None and lookup[2] is not None and lookup[2][0] == lookup[1]:
+            return
+        super().check_throttles(request)
+
+    def create(self, request, *args, **kwargs):
+        if request.headers.get(idempotency.HEADER) is None:
+            return super().create(request, *args, **kwargs)
+        lookup = self.idempotency_lookup(request)
+        if lookup is None:
+            return Response({'error': f'{idempotency.HEADER} must be 1 to {idempotency.MAX_KEY_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        key, fingerprint, outcome = lookup
+        if outcome is not None:
+            stored_fingerprint, status_code, data = outcome
+            if stored_fingerprint != fingerprint:
+                return Response({'error': f'This {idempotency.HEADER} was already used for a different request'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            return Response(data, status=status_code, headers={'Idempotent-Replayed': 'true'})
+
+        try:
+            with transaction.atomic():
+                IdempotencyRecord.objects.filter(key=key, date_created__lt=idempotency.expiry_cutoff()).delete()
+                # Inserted first, so a concurrent attempt with the same key blocks here and then fails.
+                record = IdempotencyRecord.objects.create(key=key, fingerprint=fingerprint)
+                response = super().create(request, *args, **kwargs)
+                record.status_code, record.response = response.status_code, response.data
+                record.save(update_fields=['status_code', 'response'])
+        except IntegrityError:
+            return Response({'error': f'A request with this {idempotency.HEADER} is already being processed'},
+                            status=status.HTTP_409_CONFLICT)
+        idempotency.store_outcome(key, fingerprint, response.status_code, record.response)
+        return response
+
+
+class BookingApplicationCreateViewSet(IdempotentCreateMixin, mixins.CreateModelMixin, GenericViewSet):
     queryset = BookingApplication.objects.all()
     serializer_class = BookingApplicationSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [ScopedRateThrottle, ScopedAccountRateThrottle]
+    throttle_scope = 'booking'
+    idempotency_scope = 'booking'
+    throttle_account_field = 'email'
 
 
 class AdminBookingApplicationAdditionalViewSet(GenericViewSet):
@@ -235,7 +602,13 @@ class AdminBookingApplicationAdditionalViewSet(GenericViewSet):
             {'total_active_count': total_active_count, 'recent_count': recent_count})
 
 
-class BookingApplicationListRetrieveViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
+EXPAND_PARAMETER = OpenApiParameter(name='expand', type=str, required=False, enum=['package'],
+                                   description="Embed the full flight package instead of its id")
+
+
+@extend_schema_view(list=extend_schema(parameters=[EXPAND_PARAMETER]),
+                    retrieve=extend_schema(parameters=[EXPAND_PARAMETER]))
+class BookingApplicationListRetrieveViewSet(ExpandPackageMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
                                             GenericViewSet):
     serializer_class = BookingApplicationSerializer
     queryset = BookingApplication.objects.filter(is_hidden=False)
@@ -248,16 +621,47 @@ class BookingApplicationUpdateViewSet(mixins.UpdateModelMixin, GenericViewSet):
     permission_classes = [IsAuthenticated]
 
 
-class BookingApplicationArchiveRestoreListDetailViewSet(ArchiveRestoreListDetailViewSet):
+class BookingApplicationArchiveRestoreListDetailViewSet(ExpandPackageMixin, ArchiveRestoreListDetailViewSet):
     queryset = BookingApplication.objects.all()
     serializer_class = BookingApplicationSerializer
     permission_classes = [IsAuthenticated]
 
 
-class ContactMessageCreateViewSet(mixins.CreateModelMixin, GenericViewSet):
+class ContactMessagePreviewMixin:
+    """Compute the plain-text preview of a message once, when it is written."""
+
+    def perform_create(self, serializer):
+        serializer.save(**ContactMessage.preview_fields(serializer.validated_data.get('message')))
+
+    def perform_update(self, serializer):
+        if 'message' in serializer.validated_data:
+            serializer.save(**ContactMessage.preview_fields(serializer.validated_data['message']))
+        else:
+            serializer.save()
+
+
+class ContactMessageListMixin:
+    """List responses carry the message preview only; the full HTML is returned on retrieve."""
+    list_actions = ('list', 'archived_list')
+
+    def get_serializer_class(self):
+        if getattr(self, 'action', None) in self.list_actions:
+            return ContactMessageListSerializer
+        return super().get_serializer_class()
+
+    def prune_full_fieldset(self):
+        return getattr(self, 'action', None) in self.list_actions
+
+
+class ContactMessageCreateViewSet(IdempotentCreateMixin, ContactMessagePreviewMixin, mixins.CreateModelMixin,
+                                  GenericViewSet):
     queryset = ContactMessage.objects.all()
     serializer_class = ContactMessageSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [ScopedRateThrottle, ScopedAccountRateThrottle]
+    throttle_scope = 'contact'
+    idempotency_scope = 'contact'
+    throttle_account_field = 'email'
 
 
 class AdminContactMessageAdditionalViewSet(GenericViewSet):
@@ -279,20 +683,81 @@ class AdminContactMessageAdditionalViewSet(GenericViewSet):
             {'total_active_count': total_active_count, 'recent_count': recent_count})
 
 
-class ContactMessageListRetrieveViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
-                                        GenericViewSet):
+class ContactMessageListRetrieveViewSet(ContactMessageListMixin, SparseFieldsetMixin, mixins.ListModelMixin,
+                                        mixins.RetrieveModelMixin, GenericViewSet):
     serializer_class = ContactMessageSerializer
     queryset = ContactMessage.objects.filter(is_hidden=False)
     permission_classes = [IsAuthenticated]
 
 
-class ContactMessageUpdateViewSet(mixins.UpdateModelMixin, GenericViewSet):
+class ContactMessageUpdateViewSet(ContactMessagePreviewMixin, mixins.UpdateModelMixin, GenericViewSet):
     serializer_class = ContactMessageSerializer
     queryset = ContactMessage.objects.filter(is_hidden=False)
     permission_classes = [IsAuthenticated]
 
 
-class ContactMessageArchiveRestoreListDetailViewSet(ArchiveRestoreListDetailViewSet):
+class ContactMessageArchiveRestoreListDetailViewSet(ContactMessageListMixin, ArchiveRestoreListDetailViewSet):
     queryset = ContactMessage.objects.all()
     serializer_class = ContactMessageSerializer
     permission_classes = [IsAuthenticated]
+
+
+class FareCalendarViewSet(GenericViewSet):
+    serializer_class = FareCalendarDaySerializer
+    queryset = FareCalendarDay.objects.all()
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        responses={'200': None},
+        parameters=[
+            OpenApiParameter(name='origin', type=str, required=True, description="Departure city or airport"),
+            OpenApiParameter(name='destination', type=str, required=True, description="Arrival city or airport"),
+            OpenApiParameter(name='month', type=str, required=True, description="Month to show (YYYY-MM)"),
+        ],
+        description="Lowest active package price, and the package offering it, per departure day of a route."
+    )
+    def list(self, request, *args, **kwargs):
+        query = FareCalendarQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        month = query.validated_data['month']
+        # Any alias or IATA code of an airport finds its calendar; unknown places simply have no fares.
+        days = self.get_queryset().filter(
+            origin_airport_id=find_airport(query.validated_data['origin']),
+            destination_airport_id=find_airport(query.validated_data['destination']),
+            day__gte=month, day__lt=(month + datetime.timedelta(days=32)).replace(day=1),
+        ).order_by('day')
+        return Response({
+            'origin': query.validated_data['origin'],
+            'destination': query.validated_data['destination'],
+            'month': month.strftime('%Y-%m'),
+            'days': self.get_serializer(days, many=True).data,
+        })
+
+
+class BookingAnalyticsViewSet(GenericViewSet):
+    serializer_class = BookingAnalyticsQuerySerializer
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        responses={'200': None},
+        parameters=[
+            OpenApiParameter(name='start', type=str, required=False,
+                             description="First day (YYYY-MM-DD), defaults to 30 days before end"),
+            OpenApiParameter(name='end', type=str, required=False,
+                             description="Last day (YYYY-MM-DD), defaults to today"),
+            OpenApiParameter(name='granularity', type=str, required=False, enum=['day', 'week'],
+                             description="Bucket size, defaults to day"),
+            OpenApiParameter(name='group_by', type=str, required=False, enum=['package', 'destination', 'airline'],
+                             description="Split the series by package, destination or airline"),
+        ],
+        description="Bookings and passenger totals per period, read from the booking rollups."
+    )
+    @action(detail=False, methods=['get'])
+    def bookings(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        results = booking_series(params['start'], params['end'], granularity=params['granularity'],
+                                 group_by=params.get('group_by'))
+        return Response({'start': params['start'], 'end': params['end'], 'granularity': params['granularity'],
+                         'group_by': params.get('group_by'), 'results': results})